@@ -12,125 +12,188 @@ Integrated script that:
   5. Assigns the "shutter" state to each trajectory segment depending on its zone.
   6. Simplifies the trajectory and saves it in a text file ("trajectory.txt"),
      including header information such as the parent plane's color and the constant Z coordinate.
-  7. Plots the trajectory along with the contours of the planes.
+  7. Plots the trajectory along with the contours of the planes (only with --plot).
 """
 
 import re
 import math
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-from shapely.geometry import Polygon, LineString, Point, MultiLineString 
+from functools import lru_cache
+import shapely
+from shapely.geometry import Polygon, Point
 from shapely.validation import explain_validity
+from shapely.strtree import STRtree
+from shapely.prepared import prep
+
+# Precompiled patterns: a single alternation classifies each line of a plane block
+# (block header or "Key: value" field) so that parsing needs only one match per line.
+_LINE_RE = re.compile(r'^(?P<plano>Plano\s+\d+)|^\s*(?P<kind>Desde|Hasta|Color|Tipo|Radio|Centro|Vector de extrusión calculado|Ángulos|Arista\s+\d+)\s*:\s*(?P<rest>.*)$')
+_PAREN_RE = re.compile(r'\(([^)]+)\)')
+_NUM_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
 
 # ======================================================================
 # MODULE 1: Extraction of Plane Information and Hierarchy Detection
 # ======================================================================
 
-def read_planes(input_filename):
-    """
-    Reads the input file and groups the content of each plane into blocks.
-    General headers are ignored.
-    """
-    with open(input_filename, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    planes = []
-    current_block = []
-    for line in lines:
-        stripped = line.rstrip('\n')
-        # Assumes each plane block starts with "Plano"
-        if re.match(r'^Plano\s+\d+', stripped):
-            if current_block:
-                planes.append(current_block)
-            current_block = [stripped]
-        elif current_block:
-            current_block.append(stripped)
-    if current_block:
-        planes.append(current_block)
-    return planes
-
-def extract_vertices(plane_block):
-    """
-    Extracts the vertices of the plane by searching for lines starting with "Desde:".
-    It is assumed that the 'Desde' points are representative of the contour.
-    """
-    vertices = []
-    for line in plane_block:
-        if line.strip().startswith("Desde:"):
-            match = re.search(r'\(([^)]+)\)', line)
-            if match:
-                point = tuple(map(float, match.group(1).split(',')))
-                vertices.append(point)
-    if vertices:
-        # To ensure polygon closure, use the last coordinate "Hasta:" if needed.
-        hasta = None
-        for line in reversed(plane_block):
-            if line.strip().startswith("Hasta:"):
-                m = re.search(r'\(([^)]+)\)', line)
-                if m:
-                    hasta = tuple(map(float, m.group(1).split(',')))
-                    break
-        if hasta and vertices[0] != hasta:
-            vertices.append(hasta)
-    return vertices
+def iter_planes(input_filename):
+    """
+    Reads the input file and yields the content of each plane as a block of lines,
+    one block at a time. General headers are ignored.
+    """
+    block = []
+    with open(input_filename, 'r', encoding='utf-8', buffering=1 << 20, newline='\n') as f:
+        for line in f:
+            stripped = line.rstrip('\r\n')
+            # Assumes each plane block starts with "Plano"
+            m = _LINE_RE.match(stripped)
+            if m and m.lastgroup == 'plano':
+                if block:
+                    yield block
+                block = [stripped]
+            elif block:
+                block.append(stripped)
+    if block:
+        yield block
+
+def parse_coords(text):
+    """Extracts the numbers inside the first pair of parentheses of 'text' as a tuple of floats."""
+    m = _PAREN_RE.search(text)
+    if not m:
+        return None
+    return tuple(map(float, _NUM_RE.findall(m.group(1))))
 
 def build_polygon_from_vertices(vertices):
     """
     Constructs a polygon from a list of vertices.
     """
-    if not vertices or len(vertices) < 3:
+    if vertices is None or len(vertices) < 3:
         return None
     poly = Polygon(vertices)
     if not poly.is_valid:
         print("Invalid polygon:", explain_validity(poly))
     return poly
 
+def parse_value(text):
+    """Returns 'text' stripped and converted to int when possible."""
+    value = text.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def parse_float(text):
+    """Returns 'text' as a float, or None if it is not a number."""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def parse_angles(text):
+    """Returns the (start, end) angles of a text like '270.00000° - 90.00000°', or None."""
+    # '-' is the separator between both angles, not a sign: '270°-90°' is (270, 90)
+    angle_parts = text.replace("°", "").split("-")
+    if len(angle_parts) < 2:
+        return None
+    try:
+        return (float(angle_parts[0]), float(angle_parts[1]))
+    except ValueError:
+        return None
+
+# Edge fields: line kind -> (segment key, value parser)
+_SEGMENT_FIELDS = {
+    'Tipo': ("tipo", str.strip),
+    'Color': ("color", parse_value),
+    'Desde': ("desde", parse_coords),
+    'Hasta': ("hasta", parse_coords),
+    'Radio': ("radio", parse_float),
+    'Ángulos': ("angulos", parse_angles),
+    'Centro': ("centro", parse_coords),
+}
+
 def extract_plane_info(plane_block):
     """
-    From a block of text for a plane, extracts:
+    From a block of text for a plane, extracts in a single pass:
+      - The edges ("Arista") with their type, color, points, radius, angles and center
+      - The 'Desde' and 'Hasta' points of all edges as (N, 3) arrays
       - The vertices (for the contour)
       - The color
       - The extrusion vector (if exists)
       - The complete block (for reconstructing output if needed)
     Returns a dictionary with these data.
     """
-    vertices = extract_vertices(plane_block)
-    poly = build_polygon_from_vertices(vertices)
-    
+    segments = []
+    current_segment = {}
+    desde = []
+    hasta = []
     color = None
     vector_extrusion = None
     for line in plane_block:
-        if line.strip().startswith("Color:") and color is None:
-            try:
-                color = int(line.split(":",1)[1].strip())
-            except ValueError:
-                color = line.split(":",1)[1].strip()
-        if line.strip().startswith("Vector de extrusión calculado:") and vector_extrusion is None:
-            m = re.search(r'\(([^)]+)\)', line)
-            if m:
-                vector_extrusion = tuple(map(float, m.group(1).split(',')))
-    return {"block": plane_block, "vertices": vertices, "polygon": poly,
+        m = _LINE_RE.match(line)
+        if not m or m.lastgroup == 'plano':
+            continue
+        kind = m.group('kind')
+        rest = m.group('rest')
+        field = _SEGMENT_FIELDS.get(kind)
+        if field is not None:
+            key, parser = field
+            value = current_segment[key] = parser(rest)
+            if kind == 'Desde' and value:
+                desde.append(value)
+            elif kind == 'Hasta' and value:
+                hasta.append(value)
+            elif kind == 'Color' and color is None:
+                color = value
+        elif kind == 'Vector de extrusión calculado':
+            if vector_extrusion is None:
+                vector_extrusion = parse_coords(rest)
+        elif current_segment:
+            # "Arista N" starts a new edge
+            segments.append(current_segment)
+            current_segment = {}
+    if current_segment:
+        segments.append(current_segment)
+
+    desde = np.array(desde, dtype=np.float64)
+    hasta = np.array(hasta, dtype=np.float64)
+    # The 'Desde' points are representative of the contour; to ensure polygon
+    # closure, the last 'Hasta' point is appended if needed.
+    vertices = desde
+    if len(desde) and len(hasta) and not np.array_equal(desde[0], hasta[-1]):
+        vertices = np.vstack((desde, hasta[-1]))
+    poly = build_polygon_from_vertices(vertices)
+    return {"block": plane_block, "segments": segments, "desde": desde, "hasta": hasta,
+            "vertices": vertices, "polygon": poly,
+            "bbox": poly.bounds if poly else None,
+            "prepared": prep(poly) if poly else None,
             "color": color, "vector_extrusion": vector_extrusion}
 
 def detect_hierarchy(planes_info):
     """
     Detects the parent-child relationship among planes.
     Returns a list of tuples (parent_index, child_index).
+    An STRtree over the polygons restricts the inclusion test to planes whose
+    bounding boxes overlap; candidates whose bounding box is not inside the
+    parent's are discarded before the prepared inclusion test.
     """
+    polys = [(i, info["polygon"]) for i, info in enumerate(planes_info)
+             if info["polygon"] is not None]
+    if not polys:
+        return []
+    tree = STRtree([p for _, p in polys])
+
     hierarchy = []
-    n = len(planes_info)
-    for i in range(n):
-        poly1 = planes_info[i]["polygon"]
-        if poly1 is None:
-            continue
-        for j in range(n):
+    for i, poly1 in polys:
+        bi = planes_info[i]["bbox"]
+        prep1 = planes_info[i]["prepared"]
+        for k in sorted(tree.query(poly1)):
+            j, poly2 = polys[k]
             if i == j:
                 continue
-            poly2 = planes_info[j]["polygon"]
-            if poly2 is None:
+            bj = planes_info[j]["bbox"]
+            if bj[0] < bi[0] or bj[2] > bi[2] or bj[1] < bi[1] or bj[3] > bi[3]:
                 continue
-            if poly2.within(poly1):
+            if prep1.contains(poly2):
                 hierarchy.append((i, j))
     return hierarchy
 
@@ -138,134 +201,198 @@ def detect_hierarchy(planes_info):
 # MODULE 2: Trajectory Generation and Shutter Assignment
 # ===========================================================
 
-def parse_point(line):
-    """Extracts a point (x,y,z) from a line containing numbers in parentheses."""
-    match = re.search(r'\(([^)]+)\)', line)
-    if match:
-        coords = match.group(1).split(',')
-        try:
-            coords = [float(coord.strip()) for coord in coords]
-        except ValueError:
-            return None
-        return tuple(coords)
-    return None
+@lru_cache(maxsize=None)
+def unit_arc(resolution, start_angle, end_angle):
+    """
+    Returns the cosines and sines of 'resolution + 1' angles evenly spaced
+    between 'start_angle' and 'end_angle' (degrees). Cached per arc.
+    """
+    angles = np.deg2rad(np.linspace(start_angle, end_angle, num=resolution + 1))
+    cos, sin = np.cos(angles), np.sin(angles)
+    cos.flags.writeable = False
+    sin.flags.writeable = False
+    return cos, sin
 
 def interpolate_arc(segment, resolution):
     """
     Given an arc segment (with 'radio', 'centro', and 'angulos'),
-    returns a list of points approximating the arc.
+    returns an (M, 3) array of points approximating the arc.
     """
     if "angulos" not in segment or segment["angulos"] is None:
-        return [segment["desde"], segment["hasta"]]
+        return np.array([segment["desde"], segment["hasta"]], dtype=np.float64)
     start_angle, end_angle = segment["angulos"]
     if end_angle <= start_angle:
         end_angle += 360
-    angles = np.linspace(start_angle, end_angle, num=resolution + 1)
-    points = []
+    cos, sin = unit_arc(resolution, start_angle, end_angle)
     center = segment["centro"]
     radius = segment["radio"]
-    for angle in angles:
-        rad = math.radians(angle)
-        x = center[0] + radius * math.cos(rad)
-        y = center[1] + radius * math.sin(rad)
-        z = center[2] if len(center) > 2 else 0.0
-        points.append((x, y, z))
+    points = np.empty((resolution + 1, 3), dtype=np.float64)
+    points[:, 0] = center[0] + radius * cos
+    points[:, 1] = center[1] + radius * sin
+    points[:, 2] = center[2] if len(center) > 2 else 0.0
     return points
 
 def points_equal(p1, p2, tol=1e-5):
     """Returns True if the two 3D points are equal within a tolerance."""
-    return all(abs(a - b) < tol for a, b in zip(p1, p2))
+    return np.allclose(p1, p2, rtol=0.0, atol=tol)
 
 def get_segment_points(segment, resolution):
     """
-    Returns a list of points for a segment.
+    Returns an (M, 3) array of points for a segment.
     If it is an arc, interpolation is performed; for a line, 'desde' and 'hasta' are used.
     """
     tipo = segment.get("tipo", "").upper()
     if "ARC" in tipo:
-        pts = interpolate_arc(segment, resolution)
-    else:
-        pts = []
-        if "desde" in segment:
-            pts.append(segment["desde"])
-        if "hasta" in segment:
-            pts.append(segment["hasta"])
-    return pts
+        return interpolate_arc(segment, resolution)
+    pts = [segment[key] for key in ("desde", "hasta") if segment.get(key) is not None]
+    return np.array(pts, dtype=np.float64).reshape(-1, 3)
 
 def build_polygon_segments(segments, resolution):
     """
     Joins the segments to form the contour of the plane.
     Assumes that the segments are connected.
+    Returns an (N, 3) array with the closed contour.
     """
-    polygon_points = []
+    pieces = []
+    last = None
     for seg in segments:
         seg_points = get_segment_points(seg, resolution)
-        if not seg_points:
+        if len(seg_points) == 0:
             continue
-        if not polygon_points:
-            polygon_points.extend(seg_points)
+        if last is None:
+            pieces.append(seg_points)
+        elif points_equal(last, seg_points[0]):
+            pieces.append(seg_points[1:])
+        elif points_equal(last, seg_points[-1]):
+            seg_points = seg_points[::-1]
+            pieces.append(seg_points[1:])
         else:
-            if points_equal(polygon_points[-1], seg_points[0]):
-                polygon_points.extend(seg_points[1:])
-            elif points_equal(polygon_points[-1], seg_points[-1]):
-                seg_points.reverse()
-                polygon_points.extend(seg_points[1:])
-            else:
-                print("Warning: segment does not connect. Last point: {}, points: {}".format(polygon_points[-1], seg_points))
-                polygon_points.extend(seg_points)
-    if not points_equal(polygon_points[0], polygon_points[-1]):
-        polygon_points.append(polygon_points[0])
-    return polygon_points
+            print("Warning: segment does not connect. Last point: {}, points: {}".format(tuple(last), seg_points.tolist()))
+            pieces.append(seg_points)
+        last = seg_points[-1]
+    if not pieces:
+        return np.empty((0, 3))
+    if not points_equal(pieces[0][0], last):
+        pieces.append(pieces[0][:1])
+    return np.concatenate(pieces)
 
 def get_polygon_coords_from_segments(segments, resolution):
     """
-    From the list of segments of a plane, returns a list of 2D coordinates.
+    From the list of segments of a plane, returns an (N, 2) array of 2D coordinates.
     """
     poly3d = build_polygon_segments(segments, resolution)
-    return [(pt[0], pt[1]) for pt in poly3d]
+    return poly3d[:, :2]
 
 def generate_scanlines(poly, spacing):
     """
-    Generates horizontal scanlines covering the area of polygon 'poly'
-    with spacing 'spacing'.
+    Generates the Y coordinates of the horizontal scanlines covering the area
+    of polygon 'poly' with spacing 'spacing'.
     """
     minx, miny, maxx, maxy = poly.bounds
-    lines = []
-    y = miny
-    while y <= maxy:
-        line = LineString([(minx, y), (maxx, y)])
-        lines.append(line)
-        y += spacing
-    return lines
+    # Running sum (y += spacing), so the rows fall on the same Y values as the
+    # original loop, rounding included
+    n_rows = int(np.floor((maxy - miny) / spacing)) + 2
+    ys = np.add.accumulate(np.concatenate(([miny], np.full(n_rows - 1, spacing))))
+    return ys[ys <= maxy]
+
+def polygon_edges(poly):
+    """
+    Returns the edges of the exterior and interior rings of 'poly'
+    as an (E, 4) array of (x0, y0, x1, y1).
+    """
+    edges = []
+    for ring in [poly.exterior] + list(poly.interiors):
+        coords = np.asarray(ring.coords)[:, :2]
+        edges.append(np.hstack((coords[:-1], coords[1:])))
+    return np.vstack(edges)
+
+def scanline_crossings(edges, ys, top):
+    """
+    Computes the X crossings of every scanline in 'ys' with the polygon 'edges'.
+    Edges are sorted by their lower Y so that the active edge table only advances
+    a cursor to add new edges and drops the ones already passed.
+    Returns the sorted crossings of all rows in a flat array and a CSR-style
+    'row_ptr' array: the crossings of row i are xs[row_ptr[i]:row_ptr[i+1]].
+    """
+    x0, y0, x1, y1 = edges.T
+    ymin = np.minimum(y0, y1)
+    ymax = np.maximum(y0, y1)
+    # Horizontal edges never cross a scanline (ymin == ymax), so their slope is irrelevant
+    inv_slope = np.divide(x1 - x0, y1 - y0, out=np.zeros_like(x0), where=(y1 != y0))
+
+    order = np.argsort(ymin, kind='stable')
+    ymin_sorted = ymin[order]
+    active = np.empty(0, dtype=np.intp)
+    cursor = 0
+    rows = []
+    for y in ys:
+        if y < top:
+            # Half-open rule [ymin, ymax) so shared vertices are counted once
+            new_cursor = np.searchsorted(ymin_sorted, y, side='right')
+            active = np.concatenate((active, order[cursor:new_cursor]))
+            cursor = new_cursor
+            active = active[ymax[active] > y]
+            idx = active
+        else:
+            # The top row uses (ymin, ymax] to keep the upper contour
+            idx = np.flatnonzero((ymin < y) & (y <= ymax))
+        rows.append(np.sort(x0[idx] + (y - y0[idx]) * inv_slope[idx]))
+
+    row_ptr = np.zeros(len(rows) + 1, dtype=np.intp)
+    row_ptr[1:] = np.cumsum([len(r) for r in rows])
+    xs = np.concatenate(rows) if rows else np.empty(0)
+    return xs, row_ptr
 
 def create_trajectory_points(plane_poly, spacing):
     """
     Generates a raster-based scanline trajectory over the contour of polygon 'plane_poly'.
-    """
-    scanlines = generate_scanlines(plane_poly, spacing)
-    trajectory = []
-    for i, line in enumerate(scanlines):
-        inter = plane_poly.intersection(line)
-        segments = []
-        if inter.is_empty:
-            continue
-        if isinstance(inter, LineString):
-            segments = [inter]
-        elif isinstance(inter, MultiLineString):
-            segments = list(inter)
-        line_points = []
-        for seg in segments:
-            num_samples = max(2, int(np.ceil(seg.length / spacing)))
-            samples = [seg.interpolate(t, normalized=True) for t in np.linspace(0, 1, num_samples)]
-            if i % 2 == 1:
-                samples = list(reversed(samples))
-            line_points.extend([(pt.x, pt.y) for pt in samples])
-        if i == 0 and line_points and line_points[0][0] > line_points[-1][0]:
-            line_points.reverse()
-        if trajectory:
-            trajectory.append(trajectory[-1])
-        trajectory.extend(line_points)
-    return trajectory
+    The crossings of each scanline with the polygon edges are paired into fill
+    segments, and every fill segment is sampled as a linspace in a single batch.
+    On odd rows the samples of each segment are reversed, while the segments
+    keep their left-to-right order, as in the GEOS-intersection version.
+    Rows fall on the same Y values as before. The path only differs when a
+    scanline lies exactly on a horizontal edge: crossings use the half-open
+    [ymin, ymax) rule (closed at the top row) and give the interior span,
+    where GEOS returned the boundary pieces in ring direction.
+    Returns an (N, 2) array with the trajectory points.
+    """
+    ys = generate_scanlines(plane_poly, spacing)
+    xs, row_ptr = scanline_crossings(polygon_edges(plane_poly), ys, plane_poly.bounds[3])
+
+    # Fill pairs: crossings (2k, 2k+1) of each row
+    n_pairs = np.diff(row_ptr) // 2
+    pair_row = np.repeat(np.arange(len(ys)), n_pairs)
+    pair_first = np.cumsum(n_pairs) - n_pairs
+    left_idx = row_ptr[pair_row] + 2 * (np.arange(len(pair_row)) - pair_first[pair_row])
+    x_left = xs[left_idx]
+    x_right = xs[left_idx + 1]
+    # Pairs that collapse to a vertex (width at rounding level) are points, not segments
+    valid = x_right - x_left > 1e-9 * spacing
+    pair_row, x_left, x_right = pair_row[valid], x_left[valid], x_right[valid]
+    if len(pair_row) == 0:
+        return np.empty((0, 2))
+
+    # Same samples as np.linspace(x_left, x_right, num_samples) for every pair
+    num_samples = np.maximum(2, np.ceil((x_right - x_left) / spacing).astype(np.intp))
+    sample_pair = np.repeat(np.arange(len(num_samples)), num_samples)
+    sample_first = np.cumsum(num_samples) - num_samples
+    k = np.arange(len(sample_pair)) - sample_first[sample_pair]
+    step = (x_right - x_left) / (num_samples - 1)
+    sample_x = x_left[sample_pair] + k * step[sample_pair]
+    last = sample_first + num_samples - 1
+    sample_x[last] = x_right
+    sample_row = pair_row[sample_pair]
+
+    # Serpentine: on odd rows reverse the samples inside each fill segment
+    order = np.arange(len(sample_row))
+    odd = sample_row % 2 == 1
+    odd_pair = sample_pair[odd]
+    order[odd] = sample_first[odd_pair] + last[odd_pair] - order[odd]
+
+    trajectory = np.column_stack((sample_x[order], ys[sample_row]))
+    # Each row after the first repeats the previous point before starting
+    row_starts = np.flatnonzero(np.diff(sample_row)) + 1
+    return np.insert(trajectory, row_starts, trajectory[row_starts - 1], axis=0)
 
 def is_on_border(point, allowed_area, tol=1e-3):
     """Returns True if the point is on the boundary of the allowed area."""
@@ -282,116 +409,177 @@ def point_zone(point, allowed_area, hole_poly):
     pt = Point(point)
     if allowed_area.contains(pt):
         return 1
-    elif hole_poly.contains(pt):
+    elif hole_poly is not None and hole_poly.contains(pt):
         return 2
     else:
         return 0
 
-def assign_shutter_to_trajectory(trajectory, allowed_area, hole_poly):
+def point_zones(xs, ys, allowed_area, hole_poly):
+    """
+    Vectorized counterpart of point_zone: returns the zone of every point
+    (1 allowed area, 2 child plane, 0 elsewhere) as a uint8 array.
+    """
+    in_allowed = shapely.contains_xy(allowed_area, xs, ys)
+    zones = in_allowed.astype(np.uint8)
+    if hole_poly is not None:
+        rest = ~in_allowed
+        in_hole = shapely.contains_xy(hole_poly, xs[rest], ys[rest])
+        zones[np.flatnonzero(rest)[in_hole]] = 2
+    return zones
+
+def assign_shutter_to_trajectory(trajectory, allowed_area, hole_poly, tol=1e-3):
     """
     Assigns a shutter state to each segment of the trajectory:
-      - If both endpoints are in Zone 1: "open"
-      - Otherwise: "closed"
-      - If any endpoint is on the border, the shutter is forced "open".
-    Returns a list of tuples: (start_point, end_point, shutter_state).
-    """
-    traj_with_shutter = []
-    for i in range(len(trajectory)-1):
-        pt1 = trajectory[i]
-        pt2 = trajectory[i+1]
-        zone1 = point_zone(pt1, allowed_area, hole_poly)
-        zone2 = point_zone(pt2, allowed_area, hole_poly)
-        shutter = "open" if zone1 == 1 and zone2 == 1 else "closed"
-        if is_on_border(pt1, allowed_area) or is_on_border(pt2, allowed_area):
-            shutter = "open"
-        traj_with_shutter.append((pt1, pt2, shutter))
-    return traj_with_shutter
-
-def are_collinear(p, q, r, tol=1e-5):
-    """Determines if three points are collinear within a tolerance."""
-    v1 = (q[0]-p[0], q[1]-p[1])
-    v2 = (r[0]-q[0], r[1]-q[1])
-    cross = v1[0]*v2[1] - v1[1]*v2[0]
-    return abs(cross) < tol
-
-def simplify_trajectory(traj_with_shutter, tol=1e-5):
-    """
-    Simplifies the trajectory by concatenating consecutive segments that are collinear
-    and have the same shutter state.
-    Returns a list of simplified segments.
-    """
-    if not traj_with_shutter:
-        return []
-    simplified = []
-    current_start, current_end, current_shutter = traj_with_shutter[0]
-    for seg in traj_with_shutter[1:]:
-        p_start, p_end, shutter = seg
-        if shutter == current_shutter and are_collinear(current_start, current_end, p_end, tol):
-            current_end = p_end
+      - If both endpoints are in Zone 1: open (1)
+      - Otherwise: closed (0) (this includes points inside the child plane, Zone 2;
+        'hole_poly' may be None when the parent has no child)
+      - If any endpoint is on the border, the shutter is forced open.
+    The zones and the border test are evaluated for all points at once and
+    combined with boolean array operations, without per-segment branches.
+    Returns the segments as an (M, 4) array of (x1, y1, x2, y2) and the
+    shutter state of each segment as a uint8 array.
+    """
+    if len(trajectory) < 2:
+        return np.empty((0, 4)), np.empty(0, dtype=np.uint8)
+    xs = trajectory[:, 0]
+    ys = trajectory[:, 1]
+    zones = point_zones(xs, ys, allowed_area, hole_poly)
+    # Points closer than 'tol' to the boundary are those inside its buffer
+    border_region = allowed_area.boundary.buffer(tol)
+    shapely.prepare(border_region)
+    border = shapely.contains_xy(border_region, xs, ys)
+
+    allowed = zones == 1
+    adj_open = allowed[:-1] & allowed[1:]
+    border_any = border[:-1] | border[1:]
+    shutter = (adj_open | border_any).astype(np.uint8)
+
+    segs = np.hstack((trajectory[:-1], trajectory[1:]))
+    return segs, shutter
+
+def douglas_peucker(points, tol):
+    """
+    Douglas-Peucker simplification of an (N, 2) polyline, implemented with an
+    explicit stack instead of recursion. Returns a boolean mask of the points
+    to keep (the first and last points are always kept).
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        x0, y0 = points[first]
+        dx, dy = points[last] - points[first]
+        inner = points[first + 1:last]
+        norm = math.hypot(dx, dy)
+        if norm > 0:
+            # Perpendicular distance of the inner points to the chord
+            dist = np.abs(dx * (inner[:, 1] - y0) - dy * (inner[:, 0] - x0)) / norm
         else:
-            simplified.append((current_start, current_end, current_shutter))
-            current_start, current_end, current_shutter = seg
-    simplified.append((current_start, current_end, current_shutter))
-    return simplified
+            dist = np.hypot(inner[:, 0] - x0, inner[:, 1] - y0)
+        k = int(np.argmax(dist))
+        if dist[k] > tol:
+            split = first + 1 + k
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+def simplify_trajectory(segs, shutter, tol=1e-5):
+    """
+    Simplifies the trajectory by splitting it into runs of consecutive segments
+    with the same shutter state and applying Douglas-Peucker with tolerance
+    'tol' to each run, so collinear (or nearly collinear) points are removed
+    while the shape and the shutter switching points are preserved.
+    Returns the simplified segments (M, 4) and their shutter states.
+    """
+    if len(segs) == 0:
+        return segs, shutter
+    points = np.vstack((segs[:1, :2], segs[:, 2:]))
+    run_starts = np.flatnonzero(shutter[1:] != shutter[:-1]) + 1
+    bounds = np.concatenate(([0], run_starts, [len(segs)]))
 
-def save_trajectory_to_txt(traj_simplified, filename, trajectory_color, constant_z, decimals=6):
+    simplified = []
+    states = []
+    for first, end in zip(bounds[:-1], bounds[1:]):
+        # Segments first..end-1 use points first..end
+        run = points[first:end + 1]
+        kept = run[douglas_peucker(run, tol)]
+        simplified.append(np.hstack((kept[:-1], kept[1:])))
+        states.append(np.full(len(kept) - 1, shutter[first], dtype=np.uint8))
+    return np.vstack(simplified), np.concatenate(states)
+
+@lru_cache(maxsize=None)
+def segment_templates(decimals):
+    """
+    Returns the output line templates specialized for 'decimals', indexed by
+    shutter state: (closed, open). Only the four coordinates remain to be filled.
+    """
+    fmt = "%.{0}f".format(decimals)
+    head = "De (" + fmt + ", " + fmt + ") a (" + fmt + ", " + fmt + "): shutter "
+    return (head + "closed", head + "open")
+
+def save_trajectory_to_txt(segs, shutter, filename, trajectory_color, constant_z, decimals=6):
     """
     Saves the simplified trajectory to a text file.
     A header with the parent's color and the Z constant is added.
+    The body is formatted from the segment array with templates specialized
+    for 'decimals' and written with a single call.
     """
-    fmt = "{{:.{0}f}}".format(decimals)
-    with open(filename, "w", encoding="utf-8") as f:
+    templates = segment_templates(decimals)
+    body = "\n".join([templates[state] % coords
+                      for coords, state in zip(map(tuple, segs.tolist()), shutter.tolist())])
+    with open(filename, "w", encoding="utf-8", buffering=1 << 20, newline="\n") as f:
         f.write("Color extraido del Plano padre: {}\n".format(trajectory_color))
         f.write("Constante Z: {}\n".format(constant_z))
         f.write("\n")
-        for seg in traj_simplified:
-            p1, p2, shutter = seg
-            line = ("De (" + fmt + ", " + fmt + ") a (" + fmt + ", " + fmt + "): shutter {}"
-                    ).format(p1[0], p1[1], p2[0], p2[1], shutter)
-            f.write(line + "\n")
+        if body:
+            f.write(body + "\n")
     print("La trayectoria se ha guardado en '{}'".format(filename))
 
-def plot_trajectory(traj_simplified, plane1_coords, plane2_coords, trajectory_color, constant_z):
+def plot_trajectory(segs, shutter, plane1_coords, plane2_coords, trajectory_color, constant_z, max_labels=50):
     """
     Plots the simplified trajectory and the contours:
       - The parent plane contour (blue).
       - The child plane contour (red) if present.
-      - The trajectory with shutter state labels on each segment.
-    """
-    plt.figure(figsize=(8,10),dpi=120)
-
-    # Extract points for trajectory plotting
-    xs = []
-    ys = []
-    for seg in traj_simplified:
-        p1, p2, shutter = seg
-        xs.extend([p1[0], p2[0]])
-        ys.extend([p1[1], p2[1]])
-    plt.plot(xs, ys, '.-', color='C1', label="Trajectory")
+      - The trajectory with shutter state labels on (at most 'max_labels') segments.
+    Matplotlib is only imported when a plot is requested.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    fig, ax = plt.subplots(figsize=(8,10), dpi=120)
+
+    # Draw all trajectory segments as a single artist
+    ax.add_collection(LineCollection(segs.reshape(-1, 2, 2), colors='C1', label="Trajectory"))
+    ax.plot(segs[:, [0, 2]].ravel(), segs[:, [1, 3]].ravel(), '.', color='C1')
     
     # Plot parent plane contour
-    if plane1_coords:
+    if len(plane1_coords):
         plane1_x, plane1_y = zip(*plane1_coords)
-        plt.plot(list(plane1_x)+[plane1_x[0]], list(plane1_y)+[plane1_y[0]], 'C0', label="Parent")
+        ax.plot(list(plane1_x)+[plane1_x[0]], list(plane1_y)+[plane1_y[0]], 'C0', label="Parent")
     
     # Plot child plane contour if available
-    if plane2_coords:
+    if len(plane2_coords):
         plane2_x, plane2_y = zip(*plane2_coords)
-        plt.plot(list(plane2_x)+[plane2_x[0]], list(plane2_y)+[plane2_y[0]], 'C2', label="Child (Void)")
-    
-    # Annotate shutter state at the midpoint of each segment
-    for seg in traj_simplified:
-        mid_x = (seg[0][0] + seg[1][0]) / 2.0
-        mid_y = (seg[0][1] + seg[1][1]) / 2.0
-        plt.text(mid_x, mid_y, seg[2], fontsize=8, color='purple')
+        ax.plot(list(plane2_x)+[plane2_x[0]], list(plane2_y)+[plane2_y[0]], 'C2', label="Child (Void)")
     
+    # Annotate shutter state at the midpoint of a subsample of segments
+    step = max(1, int(np.ceil(len(segs) / max_labels)))
+    mids = (segs[::step, :2] + segs[::step, 2:]) / 2.0
+    for (mid_x, mid_y), state in zip(mids, shutter[::step]):
+        ax.text(mid_x, mid_y, "open" if state else "closed", fontsize=8, color='purple')
 
-    plt.title(f"Shutter Actuated Trajectory")
-    plt.xlabel("X [µm]")
-    plt.ylabel("Y [µm]")
-    plt.legend(loc='lower right', fontsize=8)
-    plt.gca().set_aspect('equal', adjustable='box')
-    plt.grid(True)
+    ax.set_title(f"Shutter Actuated Trajectory")
+    ax.set_xlabel("X [µm]")
+    ax.set_ylabel("Y [µm]")
+    ax.legend(loc='lower right', fontsize=8)
+    ax.set_aspect('equal', adjustable='box')
+    ax.autoscale_view()
+    ax.grid(True)
     plt.show()
 
 # ======================================================
@@ -399,9 +587,11 @@ def plot_trajectory(traj_simplified, plane1_coords, plane2_coords, trajectory_co
 # ======================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Generates the shutter-actuated trajectory of a parent plane with its child void.")
+    parser.add_argument("--plot", action="store_true", help="plot the trajectory and the plane contours")
+    args = parser.parse_args()
+
     # ----- Parameters and paths -----
-    base_directory = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\RdA'
-    os.chdir(base_directory)
     input_filename = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\RdA\testhiercode.txt'
     trajectory_output = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\RdA\trajectorytesting.txt'
     resolution = 30           # Resolution for arc interpolation
@@ -411,11 +601,7 @@ def main():
     # ------------------------------
     
     # 1. Read the input file and extract plane information
-    plane_blocks = read_planes(input_filename)
-    planes_info = []
-    for block in plane_blocks:
-        info = extract_plane_info(block)
-        planes_info.append(info)
+    planes_info = [extract_plane_info(block) for block in iter_planes(input_filename)]
     
     if not planes_info:
         print("No plane information detected in the file.")
@@ -432,84 +618,47 @@ def main():
         son_idx = None
 
     # 3. Extract contours from the edges of the parent (and child if exists)
-    def extract_segments(plane_block):
-        segments = []
-        current_segment = {}
-        for line in plane_block:
-            stripped = line.strip()
-            if re.match(r'^Arista\s+\d+:', stripped):
-                if current_segment:
-                    segments.append(current_segment)
-                current_segment = {}
-            else:
-                if stripped.startswith("Tipo:"):
-                    current_segment["tipo"] = stripped.split(":",1)[1].strip()
-                elif stripped.startswith("Color:"):
-                    try:
-                        current_segment["color"] = int(stripped.split(":",1)[1].strip())
-                    except ValueError:
-                        current_segment["color"] = stripped.split(":",1)[1].strip()
-                elif stripped.startswith("Desde:"):
-                    current_segment["desde"] = parse_point(stripped)
-                elif stripped.startswith("Hasta:"):
-                    current_segment["hasta"] = parse_point(stripped)
-                elif stripped.startswith("Radio:"):
-                    try:
-                        current_segment["radio"] = float(stripped.split(":",1)[1].strip())
-                    except ValueError:
-                        current_segment["radio"] = None
-                elif stripped.startswith("Ángulos:"):
-                    parts = stripped.split(":",1)[1].strip().replace("°", "")
-                    angle_parts = parts.split("-")
-                    if len(angle_parts) >= 2:
-                        try:
-                            current_segment["angulos"] = (float(angle_parts[0].strip()), float(angle_parts[1].strip()))
-                        except ValueError:
-                            current_segment["angulos"] = None
-                elif stripped.startswith("Centro:"):
-                    current_segment["centro"] = parse_point(stripped)
-        if current_segment:
-            segments.append(current_segment)
-        return segments
-
-    father_segments = extract_segments(planes_info[father_idx]["block"])
+    father_segments = planes_info[father_idx]["segments"]
     father_coords = get_polygon_coords_from_segments(father_segments, resolution)
     
     if son_idx is not None:
-        son_segments = extract_segments(planes_info[son_idx]["block"])
+        son_segments = planes_info[son_idx]["segments"]
         son_coords = get_polygon_coords_from_segments(son_segments, resolution)
     else:
-        son_coords = []
+        son_coords = np.empty((0, 2))
     
     # 4. Determine the Z constant from the first point of the parent's vertices
     constant_z = 0.0
-    if father_coords and len(planes_info[father_idx]["vertices"][0]) >= 3:
+    if len(father_coords) and len(planes_info[father_idx]["vertices"][0]) >= 3:
         constant_z = planes_info[father_idx]["vertices"][0][2]
     
     # 5. Extract the parent's color
     father_color = planes_info[father_idx]["color"]
     
     # 6. Create the allowed polygon: external contour (parent) and void (child) if exists
-    if son_coords:
+    father_poly = Polygon(father_coords)
+    if len(son_coords):
         allowed_area = Polygon(father_coords, [son_coords])
         hole_poly = Polygon(son_coords)
+        shapely.prepare(hole_poly)
     else:
-        allowed_area = Polygon(father_coords)
-        hole_poly = Polygon()
-    
-    father_poly = Polygon(father_coords)
+        allowed_area = father_poly
+        hole_poly = None
+    # Prepared geometries make the containment queries use an internal edge index
+    shapely.prepare(allowed_area)
     
     # 7. Generate the scanline-based trajectory over the parent's area
     trajectory = create_trajectory_points(father_poly, spacing)
-    traj_with_shutter = assign_shutter_to_trajectory(trajectory, allowed_area, hole_poly)
+    segs, shutter = assign_shutter_to_trajectory(trajectory, allowed_area, hole_poly)
     # Simplify the trajectory to avoid duplicate segments with the same shutter state
-    traj_simplified = simplify_trajectory(traj_with_shutter)
+    segs, shutter = simplify_trajectory(segs, shutter)
     
     # 8. Save the simplified trajectory to a text file
-    save_trajectory_to_txt(traj_simplified, trajectory_output, trajectory_color=father_color, constant_z=constant_z)
+    save_trajectory_to_txt(segs, shutter, trajectory_output, trajectory_color=father_color, constant_z=constant_z)
     
-    # 9. Plot the simplified trajectory and the plane contours
-    plot_trajectory(traj_simplified, father_coords, son_coords, trajectory_color=father_color, constant_z=constant_z)
+    # 9. Plot the simplified trajectory and the plane contours (opt-in)
+    if args.plot:
+        plot_trajectory(segs, shutter, father_coords, son_coords, trajectory_color=father_color, constant_z=constant_z)
 
 if __name__ == '__main__':
     main()
@@ -5,15 +5,17 @@ Created on Tue Jan 21 13:25:03 2025
 
 """
 import os
-import ast
 import math
+import argparse
 import numpy as np
-from shapely.geometry import LineString, Polygon, MultiLineString, GeometryCollection
+from itertools import chain, repeat
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import shapely
+from shapely.geometry import Polygon
 from shapely.ops import polygonize, unary_union
-
-# Adjust to your working folder:
-directory = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\RdA'
-os.chdir(directory)
+from scipy.spatial import cKDTree
+from planes_parser import parse_planos
 
 # AutoCAD color → feedrate (mm/s)
 COLOR_SPEED_MAPPING = {
@@ -27,28 +29,17 @@ VOXEL_DIAMETER = 0.2  # μm
 OVERLAP = 0.5  # fraction
 ARC_RESOLUTION = 30  # Points per full arc
 
+# Motion command for one point (mm)
+LINEAR_FMT = "LINEAR X%.10f Y%.10f Z%.10f F $SPEED"
+
+# Below this many planes the pool start-up costs more than it saves
+PARALLEL_MIN_PLANES = 16
+
 # -----------------------------------------------------------------------------
 # 1. Parse processed planes file (FIXED KEYS)
 # -----------------------------------------------------------------------------
-def parse_angles(line):
-    parts = line.split(":", 1)[1].strip().replace("°", "")
-    angle_parts = parts.split("-")
-    if len(angle_parts) >= 2:
-        try:
-            start_angle = float(angle_parts[0].strip())
-            end_angle = float(angle_parts[1].strip())
-            return (start_angle, end_angle)
-        except ValueError:
-            return None
-    return None
-
-def interpolate_arc(segment, resolution, extrusion=(0.0, 0.0, 1.0)):
-    if "angulos" not in segment or segment["angulos"] is None:
-        return [segment["start"], segment["end"]]  # <--- Claves en inglés
-    
-    start_angle, end_angle = segment["angulos"]
-    center = segment["centro"]
-    radius = segment["radio"]
+def interpolate_arc(start, center, radius, arc_angles, resolution, extrusion=(0.0, 0.0, 1.0)):
+    start_angle, end_angle = arc_angles
     extrusion_z = extrusion[2] if len(extrusion) > 2 else 1.0
     
     # Direction handling
@@ -61,127 +52,260 @@ def interpolate_arc(segment, resolution, extrusion=(0.0, 0.0, 1.0)):
             start_angle += 360
         angles = np.linspace(start_angle, end_angle, resolution + 1)[::-1]
     
-    # Generate points
-    points = []
-    for angle in angles:
-        angle_deg = angle % 360
-        rad = math.radians(angle_deg)
-        x = center[0] + radius * math.cos(rad)
-        y = center[1] + radius * math.sin(rad)
-        z = center[2] if len(center) > 2 else 0.0
-        points.append((x, y, z))
+    # Generate points: the first angle and the (constant) step are the only
+    # trig evaluations, every other sample is the previous one rotated by the
+    # step (angle-addition recurrence as a cumulative complex product)
+    theta0 = math.radians(angles[0] % 360.0)
+    dtheta = math.radians(angles[1] - angles[0])
+    rot = np.full(len(angles), complex(math.cos(dtheta), math.sin(dtheta)))
+    rot[0] = complex(math.cos(theta0), math.sin(theta0))
+    unit = np.cumprod(rot)
+    points = np.empty((len(angles), 3))
+    points[:, 0] = center[0] + radius * unit.real
+    points[:, 1] = center[1] + radius * unit.imag
+    points[:, 2] = center[2] if len(center) > 2 else 0.0
     
     # Ensure start/end match
-    if not np.allclose(points[0], segment["start"], atol=1e-5):  # <--- Clave en inglés
-        points = list(reversed(points))
+    if not np.allclose(points[0], start, atol=1e-5):
+        points = points[::-1]
     return points
 
-def parse_planos(file_path):
-    planes = []
-    current = None
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if line.startswith("PLANOS PROCESADOS:"):
-            i += 1; continue
-        if line.startswith("Plano"):
-            if current: planes.append(current)
-            current = {'metadata': line, 'extrusion': None, 'edges': []}
-            i += 1; continue
-        if current:
-            if "Vector de extrusión" in line:
-                try:
-                    current['extrusion'] = ast.literal_eval(line.split(":",1)[1].strip())
-                except:
-                    current['extrusion'] = (0.0, 0.0, 1.0)
-            elif line.startswith("Arista"):
-                edge = {'start': None, 'end': None}  # <--- Inicializar claves
-                i += 1
-                while i < len(lines) and lines[i].startswith("    "):
-                    sl = lines[i].strip()
-                    if sl.startswith("Tipo:"):
-                        edge['type'] = sl.split(":",1)[1].strip()
-                    elif sl.startswith("Color:"):
-                        try: edge['color'] = int(sl.split(":",1)[1].strip())
-                        except: edge['color'] = None
-                    elif sl.startswith("Desde:"):  # Parsear como 'start'
-                        try: edge['start'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['start'] = None
-                    elif sl.startswith("Hasta:"):  # Parsear como 'end'
-                        try: edge['end'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['end'] = None
-                    elif sl.startswith("Radio:"):
-                        try: edge['radio'] = float(sl.split(":",1)[1].strip())
-                        except: edge['radio'] = None
-                    elif sl.startswith("Ángulos:"):
-                        edge['angulos'] = parse_angles(sl)
-                    elif sl.startswith("Centro:"):
-                        try: edge['centro'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['centro'] = None
-                    elif sl.startswith("Entidad original:"):
-                        if i+1 < len(lines):
-                            entity_line = lines[i+1].strip()
-                            try:
-                                edge['entity'] = ast.literal_eval(entity_line)
-                                edge['extrusion'] = edge['entity'].get('extrusion', (0.0, 0.0, 1.0))
-                            except:
-                                edge['entity'] = None
-                            i += 1  # Skip line
-                    i += 1
-                current['edges'].append(edge)
-                continue
-        i += 1
-    if current: planes.append(current)
+def _vec(value, size):
+    return value if value and len(value) == size else (np.nan,) * size
+
+def edges_to_arrays(edges):
+    # AoS -> SoA: one C-contiguous array per edge field, built once at load
+    # time. Missing or malformed coordinates (None, not 3-D) are NaN and
+    # flagged by the start_valid / end_valid / is_arc masks.
+    segments = np.array([(_vec(e['start'], 3), _vec(e['end'], 3)) for e in edges], float).reshape(-1, 2, 3)
+    valid = np.isfinite(segments).all(axis=2)
+    is_arc = [('ARC' in (e.get('type') or '').upper() and bool(e.get('radio'))
+               and bool(e.get('angulos')) and bool(e.get('centro'))) for e in edges]
+    return {
+        'starts': np.ascontiguousarray(segments[:, 0]),
+        'ends': np.ascontiguousarray(segments[:, 1]),
+        # (N, 2, 3) start/end pairs, ready to be stacked as line edges
+        'segments': segments,
+        'start_valid': np.ascontiguousarray(valid[:, 0]),
+        'end_valid': np.ascontiguousarray(valid[:, 1]),
+        # A missing or unreadable color maps to the default speed, like 256
+        'colors': np.array([e.get('color') or 256 for e in edges], np.int32),
+        'is_arc': np.array(is_arc, bool),
+        'centers': np.array([_vec(e.get('centro'), 3) for e in edges], float).reshape(-1, 3),
+        'radii': np.array([e.get('radio') or np.nan for e in edges], float),
+        'angles': np.array([_vec(e.get('angulos'), 2) for e in edges], float).reshape(-1, 2),
+        'extrusions': np.array([e.get('extrusion', (0.0, 0.0, 1.0)) for e in edges], float).reshape(-1, 3),
+    }
+
+def load_planes(file_path):
+    planes = parse_planos(file_path)
+    for plane in planes:
+        plane.update(edges_to_arrays(plane.pop('edges')))
     return planes
 
 # -----------------------------------------------------------------------------
 # 2. Raster scanline generator
 # -----------------------------------------------------------------------------
+def polygon_edges(polygon: Polygon):
+    """Edges of the exterior and interior rings as an (E, 4) array of (x0, y0, x1, y1)."""
+    edges = []
+    for ring in [polygon.exterior, *polygon.interiors]:
+        c = np.asarray(ring.coords)[:, :2]
+        edges.append(np.hstack((c[:-1], c[1:])))
+    return np.vstack(edges)
+
 def generate_raster_lines(polygon: Polygon, spacing: float):
+    # Edge-table sweep done in bulk: every edge is expanded over the rows it
+    # straddles (found with searchsorted on the sorted row heights), so all
+    # crossings are computed at once and sorted by (row, x) instead of
+    # admitting/retiring edges row by row in Python.
     minx, miny, maxx, maxy = polygon.bounds
-    y = miny
-    coords2d = []
-    forward = True
-
-    while y <= maxy:
-        scan = LineString([(minx-spacing, y), (maxx+spacing, y)])
-        inter = polygon.intersection(scan)
-        
-        if isinstance(inter, LineString):
-            segs = [inter]
-        elif isinstance(inter, MultiLineString):
-            segs = list(inter.geoms)
-        elif isinstance(inter, GeometryCollection):
-            segs = [g for g in inter.geoms if isinstance(g, LineString)]
+    x0, y0, x1, y1 = polygon_edges(polygon).T
+    ymin = np.minimum(y0, y1)
+    ymax = np.maximum(y0, y1)
+    # Horizontal edges never straddle a row, their slope is irrelevant
+    inv_slope = np.divide(x1 - x0, y1 - y0, out=np.zeros_like(x0), where=(y1 != y0))
+
+    # Row heights as y += spacing from miny (add.accumulate sums sequentially)
+    steps = np.full(int((maxy - miny) / spacing) + 2, spacing)
+    steps[0] = miny
+    ys = np.add.accumulate(steps)
+    ys = ys[ys <= maxy]
+    below_top = np.searchsorted(ys, maxy, side='left')
+
+    # Half-open rule [ymin, ymax) so shared vertices are counted once
+    first = np.searchsorted(ys[:below_top], ymin, side='left')
+    last = np.searchsorted(ys[:below_top], ymax, side='left')
+    counts = np.maximum(last - first, 0)
+    edge = np.repeat(np.arange(len(x0)), counts)
+    row = first[edge] + np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+    if below_top < len(ys):
+        # A row exactly on the top uses (ymin, ymax] to keep the upper contour
+        top = np.flatnonzero((ymin < maxy) & (maxy <= ymax))
+        edge = np.concatenate((edge, top))
+        row = np.concatenate((row, np.full(len(top), below_top)))
+    xs = x0[edge] + (ys[row] - y0[edge]) * inv_slope[edge]
+    order = np.lexsort((xs, row))
+    row, xs = row[order], xs[order]
+
+    # Pair crossings (2k, 2k+1) within each row
+    pos = np.arange(len(row)) - np.searchsorted(row, row, side='left')
+    left = np.flatnonzero(pos % 2 == 0)
+    left = left[left + 1 < len(row)]
+    left = left[row[left + 1] == row[left]]
+    x_in, x_out, y = xs[left], xs[left + 1], ys[row[left]]
+    # A pair narrower than rounding level is the scanline touching a vertex
+    # (its two edges give the same x up to an ulp), not a segment
+    valid = x_out - x_in > 1e-9 * spacing
+    x_in, x_out, y = x_in[valid], x_out[valid], y[valid]
+
+    coords2d = np.empty((len(x_in), 2, 2))
+    coords2d[:, 0, 0] = x_in
+    coords2d[:, 1, 0] = x_out
+    coords2d[:, :, 1] = y[:, None]
+    # Back-and-forth: every other segment is traversed right to left
+    coords2d[1::2] = coords2d[1::2, ::-1]
+    return coords2d.reshape(-1, 2)
+
+def chain_ring(edges2d, tol=1e-6):
+    # Orders the edge polylines head-to-tail (reversing them when needed) by
+    # looking up the next endpoint in a KD-tree. Returns the closed ring as an
+    # (M, 2) array, or None if the edges do not form a single closed chain.
+    ends = np.array([(pts[0], pts[-1]) for pts in edges2d])
+    tree = cKDTree(ends.reshape(-1, 2))
+    used = np.zeros(len(edges2d), dtype=bool)
+    used[0] = True
+    chain = [edges2d[0]]
+    current = ends[0, 1]
+    for _ in range(len(edges2d) - 1):
+        nxt = next((c for c in tree.query_ball_point(current, tol) if not used[c // 2]), None)
+        if nxt is None:
+            return None
+        k, side = divmod(nxt, 2)
+        used[k] = True
+        pts = edges2d[k] if side == 0 else edges2d[k][::-1]
+        chain.append(pts[1:])
+        current = pts[-1]
+    if np.hypot(*(current - ends[0, 0])) > tol:
+        return None
+    return np.vstack(chain)
+
+def format_linear_block(mm):
+    # N LINEAR lines joined by newlines, formatted with a single % on a
+    # template repeated N times (faster than formatting line by line)
+    return "\n".join([LINEAR_FMT] * len(mm)) % tuple(mm.ravel().tolist())
+
+def drop_collinear(points, eps=1e-9):
+    # Removes the interior points of straight runs: a point is redundant when
+    # its incoming and outgoing moves are parallel and point the same way
+    # (reversals on the same line are real turning points and are kept).
+    if len(points) < 3:
+        return points
+    d = np.diff(points, axis=0)
+    d1, d2 = d[:-1], d[1:]
+    cross = np.linalg.norm(np.cross(d1, d2), axis=1)
+    dot = np.einsum('ij,ij->i', d1, d2)
+    scale = np.linalg.norm(d1, axis=1) * np.linalg.norm(d2, axis=1)
+    redundant = (cross <= eps * scale) & (dot > 0)
+    return points[np.r_[True, ~redundant, True]]
+
+# -----------------------------------------------------------------------------
+# 3. Generate AeroBasic code
+# -----------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def plane_basis(nx, ny, nz):
+    # (3, 2) matrix with the in-plane unit vectors u, v of the plane with
+    # normal (nx, ny, nz). Cached: planes usually share a few extrusions.
+    n = np.array([nx, ny, nz], float)
+    n /= np.linalg.norm(n)
+    arb = np.array([1,0,0])
+    if abs(np.dot(arb,n)) > 0.9:
+        arb = np.array([0,1,0])
+    u = np.cross(n, arb); u /= np.linalg.norm(u)
+    v = np.cross(n, u)
+    basis = np.column_stack((u, v))
+    basis.flags.writeable = False
+    return basis
+
+def process_plane(idx, plane, origin_xyz):
+    # Polygonizes and rasterizes one plane. Planes are independent, so this runs
+    # in worker processes; only plain arrays are returned (speed, raster in mm),
+    # or None when no polygon could be formed.
+    basis = plane_basis(*np.round(np.asarray(plane['extrusion'], float), 12).tolist())
+
+    pts3d = np.vstack((plane['starts'][plane['start_valid']],
+                       plane['ends'][plane['end_valid']]))
+    origin_plane = np.mean(pts3d, axis=0)
+
+    # Build edges with arc handling
+    valid = plane['start_valid'] & plane['end_valid']
+    for k in np.flatnonzero(~valid).tolist():
+        print(f"[WARN] Plane {idx}: edge {k + 1} missing start/end")
+    segments = plane['segments']
+    edge_points = []
+    for k in np.flatnonzero(valid).tolist():
+        if plane['is_arc'][k]:
+            points_3d = interpolate_arc(plane['starts'][k], plane['centers'][k], plane['radii'][k],
+                                        plane['angles'][k], ARC_RESOLUTION, plane['extrusions'][k])
+            if len(points_3d) >= 2:
+                edge_points.append(points_3d)
         else:
-            segs = []
+            edge_points.append(segments[k])
+
+    # Project every edge point onto the plane in a single matmul
+    counts = [len(pts) for pts in edge_points]
+    pts2d_all = np.empty((0, 2))
+    if edge_points:
+        pts2d_all = (np.vstack(edge_points) - origin_plane) @ basis
+
+    # Create polygon. Fast path: the edges already chain into a simple
+    # closed ring, so the polygon is built directly from it
+    poly2d = None
+    if edge_points:
+        ring = chain_ring(np.split(pts2d_all, np.cumsum(counts)[:-1]))
+        if ring is not None and len(ring) >= 4:
+            candidate = Polygon(ring)
+            if candidate.is_valid:
+                poly2d = candidate
+
+    if poly2d is None:
+        # Node the linework (all edge LineStrings built in one call) snapping
+        # near-coincident endpoints to a 1e-5 grid, and polygonize
+        lines2d = shapely.linestrings(pts2d_all, indices=np.repeat(np.arange(len(counts)), counts)) if counts else []
+        polys2d = list(polygonize(shapely.unary_union(lines2d, grid_size=1e-5)))
+        if not polys2d:
+            # Larger gaps: close them by inflating the linework. buffer(0)
+            # would not do here: the buffer of lines is empty, so it is the
+            # 1e-5 inflation that turns the edges into a thin closed band
+            # whose rings polygonize. The largest face is the inner one, the
+            # contour shrunk by 1e-5 µm, far below VOXEL_DIAMETER
+            polys2d = list(polygonize(unary_union(lines2d).buffer(1e-5)))
+        if not polys2d:
+            print(f"[ERROR] Plane {idx}: No polygon formed. Check edge connectivity.")
+            return None
+            
+        poly2d = max(polys2d, key=lambda P: P.area)
+        if not poly2d.is_valid:
+            poly2d = poly2d.buffer(0)
 
-        for seg in segs:
-            c = list(seg.coords)
-            if not forward:
-                c.reverse()
-            coords2d.extend(c)
-            forward = not forward
+    spacing = VOXEL_DIAMETER * (1-OVERLAP)
+    raster2d = generate_raster_lines(poly2d, spacing)
 
-        y += spacing
+    raster3d = drop_collinear(origin_plane + raster2d @ basis.T)
 
-    return coords2d
+    color_val = int(plane['colors'][0])
+    speed = COLOR_SPEED_MAPPING.get(color_val, 1.0)
+    # Offset and scale every point at once (mm relative to the global origin)
+    return speed, (raster3d - origin_xyz) / 1000
 
-# -----------------------------------------------------------------------------
-# 3. Generate AeroBasic code
-# -----------------------------------------------------------------------------
-def generate_aerobasic_plane_fill_code(planes, filename="Raster_Fill.abm"):
-    all_pts = []
-    for pl in planes:
-        for e in pl['edges']:
-            if e['start'] and e['end']:
-                all_pts.extend([e['start'], e['end']])
-    all_pts = np.array(all_pts)
-    origin_x = float(np.min(all_pts[:,0])/100)
-    origin_y = float(np.min(all_pts[:,1])/100)
-    origin_z = float(np.max(all_pts[:,2])/100)
+def generate_aerobasic_plane_fill_code(planes, filename="Raster_Fill.abm", workers=1):
+    # workers: processes for the per-plane work (1 = serial, 0 = all cores).
+    # The pool is only used from PARALLEL_MIN_PLANES planes on
+    starts = np.vstack([pl['starts'][pl['start_valid'] & pl['end_valid']] for pl in planes])
+    ends = np.vstack([pl['ends'][pl['start_valid'] & pl['end_valid']] for pl in planes])
+    all_pts = np.vstack((starts, ends))
+    origin_xyz = np.array([all_pts[:,0].min(), all_pts[:,1].min(), all_pts[:,2].max()]) / 100
+    origin_x, origin_y, origin_z = origin_xyz.tolist()
 
     margin_xy = 10.0/1000
     margin_z  = 100.0/1000
@@ -240,80 +364,29 @@ POSOFFSET SET X 0 Y 0 Z 0
 'SCOPETRIG CONTINUOUS   'Trigger the scope to start collecting data 
 'NEVER USE SCOPETRIG AND DATACOLLECT AT THE SAME TIME OR PC WILL CRASH
 """
+    # map keeps the results in plane order, serial or in parallel
+    jobs = (range(1, len(planes) + 1), planes, repeat(origin_xyz))
+    if workers == 1 or len(planes) < PARALLEL_MIN_PLANES:
+        results = list(map(process_plane, *jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as ex:
+            results = list(ex.map(process_plane, *jobs))
+
     motion_blocks = []
 
-    for idx, plane in enumerate(planes, start=1):
-        n = np.array(plane['extrusion'], float)
-        n /= np.linalg.norm(n)
-        arb = np.array([1,0,0])
-        if abs(np.dot(arb,n)) > 0.9:
-            arb = np.array([0,1,0])
-        u = np.cross(n, arb); u /= np.linalg.norm(u)
-        v = np.cross(n, u)
-
-        pts3d = np.array([e['start'] for e in plane['edges'] if e['start']] +
-                         [e['end'] for e in plane['edges'] if e['end']])
-        origin_plane = np.mean(pts3d, axis=0)
-
-        def to2d(p):
-            d = np.array(p) - origin_plane
-            return (float(np.dot(d,u)), float(np.dot(d,v)))
-
-        # Build edges with arc handling
-        lines2d = []
-        for e in plane['edges']:
-            if not e['start'] or not e['end']:
-                print(f"[WARN] Edge missing start/end: {e}")
-                continue
-            
-            tipo = e.get('type', '').upper()
-            if 'ARC' in tipo and e.get('radio') and e.get('angulos') and e.get('centro'):
-                extrusion = e.get('extrusion', (0.0, 0.0, 1.0))
-                points_3d = interpolate_arc(e, ARC_RESOLUTION, extrusion)
-                points_2d = [to2d(p) for p in points_3d]
-                if len(points_2d) >= 2:
-                    lines2d.append(LineString(points_2d))
-            else:
-                start_2d = to2d(e['start'])
-                end_2d = to2d(e['end'])
-                lines2d.append(LineString([start_2d, end_2d]))
-
-        # Create polygon
-        merged = unary_union(lines2d).buffer(1e-5)
-        polys2d = list(polygonize(merged))
-        if not polys2d:
-            print(f"[ERROR] Plane {idx}: No polygon formed. Check edge connectivity.")
+    for idx, result in enumerate(results, start=1):
+        if result is None:
             continue
-            
-        poly2d = max(polys2d, key=lambda P: P.area)
-        if not poly2d.is_valid:
-            poly2d = poly2d.buffer(0)
-
-        spacing = VOXEL_DIAMETER * (1-OVERLAP)
-        raster2d = generate_raster_lines(poly2d, spacing)
-
-        raster3d = [tuple(origin_plane + x*u + y*v) for x,y in raster2d]
-
-        color_val = plane['edges'][0].get('color', 256)
-        speed = COLOR_SPEED_MAPPING.get(color_val, 1.0)
+        speed, mm = result
 
         motion_blocks.append(f"\n' --- Raster fill Plane {idx} ---")
         motion_blocks.append(f"$SPEED = {speed:.1f}")
 
-        if raster3d:
-            x0,y0,z0 = raster3d[0]
-            motion_blocks.append(
-                f"LINEAR X{(x0-origin_x)/1000:.10f} "
-                f"Y{(y0-origin_y)/1000:.10f} "
-                f"Z{(z0-origin_z)/1000:.10f} F $SPEED"
-            )
+        if len(mm):
+            motion_blocks.append(format_linear_block(mm[:1]))
             motion_blocks.append("WAIT MOVEDONE X Y Z A; dwell 0.1; ShutterOpen")
-            for x,y,z in raster3d[1:]:
-                motion_blocks.append(
-                    f"LINEAR X{(x-origin_x)/1000:.10f} "
-                    f"Y{(y-origin_y)/1000:.10f} "
-                    f"Z{(z-origin_z)/1000:.10f} F $SPEED"
-                )
+            if len(mm) > 1:
+                motion_blocks.append(format_linear_block(mm[1:]))
             motion_blocks.append("ShutterClose")
 
     footer = """
@@ -325,15 +398,28 @@ POSOFFSET SET X 0 Y 0 Z 0
 VELOCITY OFF
 MSGDISPLAY 0, "Proceso laser completado con exito."
 END PROGRAM"""
-    with open(filename, "w") as f:
+    # Same text as header + "\n".join(motion_blocks) + footer, written block by
+    # block through a large buffer instead of joining everything first
+    separators = ["\n"] * len(motion_blocks)
+    separators[:1] = [""]
+    with open(filename, "w", buffering=1 << 20) as f:
         f.write(header)
-        f.write("\n".join(motion_blocks))
+        f.writelines(chain.from_iterable(zip(separators, motion_blocks)))
         f.write(footer)
     print(f"Generated {filename}")
 
 # -----------------------------------------------------------------------------
 # 4. Main
 # -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Raster fill of the processed planes.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1 = serial, 0 = all cores)")
+    args = parser.parse_args()
+    # Adjust to your working folder:
+    directory = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\RdA'
+    os.chdir(directory)
+    planes = load_planes("planos_procesadosRdAOut.txt")
+    generate_aerobasic_plane_fill_code(planes, filename="CurvedPlane_Raster_CAD2AB.txt", workers=args.workers)
+
 if __name__ == "__main__":
-    planes = parse_planos("planos_procesadosRdAOut.txt")
-    generate_aerobasic_plane_fill_code(planes, filename="CurvedPlane_Raster_CAD2AB.txt")
+    main()
@@ -23,14 +23,22 @@ COLOR_SPEED_MAPPING = {         #mm/s
     9: 2                        #Light-Gray
 } 
 
+# Línea de segmento: De (x1, y1) a (x2, y2): shutter <state>
+SEGMENT_PATTERN = re.compile(
+    r"^[ \t]*De\s*\(\s*([^,\n]+),\s*([^)\n]+)\s*\)\s*a\s*\(\s*([^,\n]+),\s*([^)\n]+)\s*\):[ \t]*shutter[ \t]*(\w+)",
+    re.IGNORECASE | re.MULTILINE)
+SEGMENT_LINE = re.compile(r"^[ \t]*De \(", re.MULTILINE)
+
+# Segmentos como array estructurado: coordenadas y shutter abierto (True) / cerrado (False)
+SEGMENT_DTYPE = np.dtype([("x1", "f8"), ("y1", "f8"), ("x2", "f8"), ("y2", "f8"), ("open", "?")])
+
 def parse_line(line):
     """
     Parsea una línea con el formato:
       De (x1, y1) a (x2, y2): shutter <state>
     y retorna una tupla: (x1, y1, x2, y2, shutter_state)
     """
-    pattern = r"De\s*\(\s*([^,]+),\s*([^)]+)\s*\)\s*a\s*\(\s*([^,]+),\s*([^)]+)\s*\):\s*shutter\s*(\w+)"
-    match = re.search(pattern, line, re.IGNORECASE)
+    match = SEGMENT_PATTERN.search(line)
     if match:
         x1 = float(match.group(1))
         y1 = float(match.group(2))
@@ -41,26 +49,55 @@ def parse_line(line):
     else:
         return None
 
+def parse_segments(text):
+    """
+    Parsea de una sola pasada todas las líneas de segmento del texto y
+    retorna un array estructurado con dtype SEGMENT_DTYPE.
+    """
+    return np.fromiter(
+        ((float(m[1]), float(m[2]), float(m[3]), float(m[4]), m[5].lower() == "open")
+         for m in SEGMENT_PATTERN.finditer(text)),
+        dtype=SEGMENT_DTYPE)
+
+def merge_collinear_segments(segments, eps=1e-9):
+    """
+    Une segmentos consecutivos que continúan en la misma dirección, están
+    conectados y tienen el mismo estado del shutter, de modo que cada tramo
+    recto se emite como un único LINEAR.
+    """
+    if len(segments) < 2:
+        return segments
+    dx = segments["x2"] - segments["x1"]
+    dy = segments["y2"] - segments["y1"]
+    cross = dx[:-1] * dy[1:] - dy[:-1] * dx[1:]
+    dot = dx[:-1] * dx[1:] + dy[:-1] * dy[1:]
+    scale = np.hypot(dx[:-1], dy[:-1]) * np.hypot(dx[1:], dy[1:])
+    # continues[i]: el segmento i+1 prolonga al segmento i
+    continues = ((segments["x2"][:-1] == segments["x1"][1:]) &
+                 (segments["y2"][:-1] == segments["y1"][1:]) &
+                 (segments["open"][:-1] == segments["open"][1:]) &
+                 (np.abs(cross) <= eps * scale) & (dot > 0))
+    starts = np.flatnonzero(np.r_[True, ~continues])
+    ends = np.r_[starts[1:] - 1, len(segments) - 1]
+    merged = segments[starts]
+    merged["x2"] = segments["x2"][ends]
+    merged["y2"] = segments["y2"][ends]
+    return merged
+
 def generate_aerobasic_code(segments, z_coord=-50.0, speed=0.8):
     """
     Genera código AeroBasic a partir de segmentos.
-    Cada segmento es una tupla: (x1, y1, x2, y2, shutter_state)
+    'segments' es un array estructurado con dtype SEGMENT_DTYPE.
     
     Se calcula el origen global (mínimo X, mínimo Y y máximo Z) a partir de todos los puntos
     y se aplican márgenes para el posicionamiento inicial.
     Las coordenadas se convierten a mm (dividiendo entre 1000) y se expresan con 10 decimales.
     """
     # --- Cálculo del origen global ---
-    all_points = []
-    for seg in segments:
-        x1, y1, x2, y2, _ = seg
-        # Se asume que z_coord es constante para todos los segmentos
-        all_points.append((x1, y1, z_coord))
-        all_points.append((x2, y2, z_coord))
-    all_points = np.array(all_points)
-    origin_x = float(np.min(all_points[:, 0]))
-    origin_y = float(np.min(all_points[:, 1]))
-    origin_z = float(np.max(all_points[:, 2]))
+    origin_x = float(min(segments["x1"].min(), segments["x2"].min()))
+    origin_y = float(min(segments["y1"].min(), segments["y2"].min()))
+    # Se asume que z_coord es constante para todos los segmentos
+    origin_z = float(z_coord)
     print(origin_x,origin_y,origin_z)
     
     # --- Márgenes (en mm) ---
@@ -124,7 +161,7 @@ POSOFFSET SET X 0 Y 0 Z 0
     motion_blocks = []
     
     # --- Posicionamiento inicial ---
-    if segments:
+    if len(segments):
         first_seg = segments[0]
         start_x, start_y = first_seg[0], first_seg[1]
         # Convertir la posición inicial a mm (relativa al origen)
@@ -135,28 +172,28 @@ POSOFFSET SET X 0 Y 0 Z 0
         motion_blocks.append("' --- Mover a la posición inicial ---")
         motion_blocks.append(f"LINEAR X{init_x:.10f} Y{init_y:.10f} Z{init_z:.10f} F $SPEED  ' Punto 0 (inicio)")
     
-    current_shutter = "closed"
-    point_index = 1
     total_segments = len(segments)
     
-    for seg in segments:
-        x1, y1, x2, y2, shutter = seg
-        
-        # Cambiar estado del shutter si es necesario
-        if shutter != current_shutter:
-            if shutter == "open":
-                motion_blocks.append("dwell 0.01")
-                motion_blocks.append("ShutterOpen")
-                motion_blocks.append("dwell 0.01")
-            else:
-                motion_blocks.append("ShutterClose")
-                motion_blocks.append("dwell 0.1")
-            current_shutter = shutter
-        pt_x = (x2 - origin_x) / 1000
-        pt_y = (y2 - origin_y) / 1000
-        pt_z = (z_coord - origin_z) / 1000
-        motion_blocks.append(f"LINEAR X{pt_x:.10f} Y{pt_y:.10f} Z{pt_z:.10f} F $SPEED  ' Punto {point_index}/{total_segments}")
-        point_index += 1
+    # Puntos finales de todos los segmentos en mm (relativos al origen);
+    # Z es constante, así que se incluye ya formateada en la plantilla
+    pt_x = (segments["x2"] - origin_x) / 1000
+    pt_y = (segments["y2"] - origin_y) / 1000
+    pt_z = (z_coord - origin_z) / 1000
+    template = f"LINEAR X%.10f Y%.10f Z{pt_z:.10f} F $SPEED  ' Punto %d/{total_segments}"
+    linear_lines = [template % p for p in zip(pt_x.tolist(), pt_y.tolist(), range(1, total_segments + 1))]
+    
+    # Cambios de estado del shutter (el estado inicial es cerrado)
+    shutter = segments["open"]
+    toggles = np.flatnonzero(shutter != np.concatenate(([False], shutter[:-1])))
+    start = 0
+    for k in toggles.tolist():
+        motion_blocks.extend(linear_lines[start:k])
+        if shutter[k]:
+            motion_blocks.extend(("dwell 0.01", "ShutterOpen", "dwell 0.01"))
+        else:
+            motion_blocks.extend(("ShutterClose", "dwell 0.1"))
+        start = k
+    motion_blocks.extend(linear_lines[start:])
 
     footer = """
 ShutterClosed
@@ -175,12 +212,12 @@ def main():
     input_file = "trajectory.txt"          # Archivo de entrada (con encabezado)
     output_file = "RdA_CAD2AB.txt"     # Archivo de salida
 
-    segments = []
     color_val = None
     constant_z_val = None
 
     with open(input_file, 'r') as f:
-        lines = f.readlines()
+        text = f.read()
+    lines = text.split("\n", 2)
     
     # Se asume que las dos primeras líneas contienen el encabezado:
     # Ejemplo:
@@ -207,21 +244,15 @@ def main():
         constant_z_val = -50.0
 
     # Procesar el resto del archivo: se ignoran líneas que no comienzan con "De ("
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        if not line.startswith("De ("):
-            continue
-        parsed = parse_line(line)
-        if parsed:
-            segments.append(parsed)
-        else:
-            print("Warning: Could not parse line:", line)
+    segments = parse_segments(text)
+    unparsed = len(SEGMENT_LINE.findall(text)) - len(segments)
+    if unparsed > 0:
+        print(f"Warning: Could not parse {unparsed} segment lines")
     
-    if not segments:
+    if not len(segments):
         print("No valid segments were found in the input file.")
         return
+    segments = merge_collinear_segments(segments)
 
     speed = COLOR_SPEED_MAPPING.get(color_val, 1)
     
@@ -234,4 +265,4 @@ def main():
     print("AeroBasic code generated in", output_file)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -6,15 +6,20 @@ Created on Tue Jan 21 13:25:03 2025
 Unified spiral fill for arbitrarily oriented planes with curved edges.
 """
 import os
-import ast
 import math
+import struct
+import pickle
+import hashlib
 import numpy as np
-from shapely.geometry import LineString, Polygon, Point, MultiLineString, GeometryCollection
-from shapely.ops import polygonize, unary_union
+import shapely
+import argparse
+from itertools import chain, repeat
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from shapely.geometry import Polygon, MultiLineString, GeometryCollection
+from shapely.ops import polygonize
+from planes_parser import parse_planos
 
-# Adjust to your working folder:
-directory = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\PlanoXZ'
-os.chdir(directory)
 # AutoCAD color → feedrate (mm/s)
 COLOR_SPEED_MAPPING = {
     1: 0.2, 2: 0.4, 3: 0.6, 4: 0.8,
@@ -27,21 +32,23 @@ VOXEL_DIAMETER = 0.2  # μm
 OVERLAP = 0.5  # fraction
 ARC_RESOLUTION = 30  # Points per full arc
 
+# Parsed planes and spirals from previous runs, in a folder next to the
+# planes file. Bump CACHE_VERSION whenever the parser or the spiral changes
+# so that older entries are not reused.
+CACHE_DIR = "spiral_cache"
+CACHE_VERSION = 1
+
+# Motion command for one point (mm). F is modal on the A3200, so the feedrate
+# is only written on the first move after each $SPEED assignment
+LINEAR_FMT = "LINEAR X%.10f Y%.10f Z%.10f"
+FEED_SUFFIX = " F $SPEED"
+
+# Below this many planes the pool start-up costs more than it saves
+PARALLEL_MIN_PLANES = 16
+
 # -----------------------------------------------------------------------------
 # 1. Parse processed planes file with arc support
 # -----------------------------------------------------------------------------
-def parse_angles(line):
-    parts = line.split(":", 1)[1].strip().replace("°", "")
-    angle_parts = parts.split("-")
-    if len(angle_parts) >= 2:
-        try:
-            start_angle = float(angle_parts[0].strip())
-            end_angle = float(angle_parts[1].strip())
-            return (start_angle, end_angle)
-        except ValueError:
-            return None
-    return None
-
 def interpolate_arc(segment, resolution, extrusion=(0.0, 0.0, 1.0)):
     if "angulos" not in segment or segment["angulos"] is None:
         return [segment["start"], segment["end"]]
@@ -61,79 +68,45 @@ def interpolate_arc(segment, resolution, extrusion=(0.0, 0.0, 1.0)):
             start_angle += 360
         angles = np.linspace(start_angle, end_angle, resolution + 1)[::-1]
     
-    # Generate points
-    points = []
-    for angle in angles:
-        angle_deg = angle % 360
-        rad = math.radians(angle_deg)
-        x = center[0] + radius * math.cos(rad)
-        y = center[1] + radius * math.sin(rad)
-        z = center[2] if len(center) > 2 else 0.0
-        points.append((x, y, z))
+    # Generate points: cos/sin are evaluated only for the first angle and the
+    # (constant) step; each sample is the previous one rotated by the step
+    # (angle-addition recurrence, vectorized as a cumulative complex product)
+    rad = math.radians(angles[0] % 360)
+    step = math.radians(angles[1] - angles[0])
+    rot = np.full(len(angles), complex(math.cos(step), math.sin(step)))
+    rot[0] = complex(math.cos(rad), math.sin(rad))
+    unit = np.cumprod(rot)
+    points = np.empty((len(angles), 3))
+    points[:, 0] = center[0] + radius * unit.real
+    points[:, 1] = center[1] + radius * unit.imag
+    points[:, 2] = center[2] if len(center) > 2 else 0.0
     
     # Ensure start/end match
     if not np.allclose(points[0], segment["start"], atol=1e-5):
-        points = list(reversed(points))
+        points = points[::-1]
     return points
 
-def parse_planos(file_path):
-    planes = []
-    current = None
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if line.startswith("PLANOS PROCESADOS:"):
-            i += 1; continue
-        if line.startswith("Plano"):
-            if current: planes.append(current)
-            current = {'metadata': line, 'extrusion': None, 'edges': []}
-            i += 1; continue
-        if current:
-            if "Vector de extrusión" in line:
-                try:
-                    current['extrusion'] = ast.literal_eval(line.split(":",1)[1].strip())
-                except:
-                    current['extrusion'] = (0.0, 0.0, 1.0)
-            elif line.startswith("Arista"):
-                edge = {'start': None, 'end': None}
-                i += 1
-                while i < len(lines) and lines[i].startswith("    "):
-                    sl = lines[i].strip()
-                    if sl.startswith("Tipo:"):
-                        edge['type'] = sl.split(":",1)[1].strip()
-                    elif sl.startswith("Color:"):
-                        try: edge['color'] = int(sl.split(":",1)[1].strip())
-                        except: edge['color'] = None
-                    elif sl.startswith("Desde:"):
-                        try: edge['start'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['start'] = None
-                    elif sl.startswith("Hasta:"):
-                        try: edge['end'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['end'] = None
-                    elif sl.startswith("Radio:"):
-                        try: edge['radio'] = float(sl.split(":",1)[1].strip())
-                        except: edge['radio'] = None
-                    elif sl.startswith("Ángulos:"):
-                        edge['angulos'] = parse_angles(sl)
-                    elif sl.startswith("Centro:"):
-                        try: edge['centro'] = ast.literal_eval(sl.split(":",1)[1].strip())
-                        except: edge['centro'] = None
-                    elif sl.startswith("Entidad original:"):
-                        if i+1 < len(lines):
-                            entity_line = lines[i+1].strip()
-                            try:
-                                edge['entity'] = ast.literal_eval(entity_line)
-                                edge['extrusion'] = edge['entity'].get('extrusion', (0.0, 0.0, 1.0))
-                            except:
-                                edge['entity'] = None
-                            i += 1
-                    i += 1
-                current['edges'].append(edge)
-                continue
-        i += 1
-    if current: planes.append(current)
+def cache_dir_for(file_path):
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR)
+
+def load_planos(file_path):
+    # parse_planos result, pickled and reused while the file is unchanged
+    stat = os.stat(file_path)
+    key = (CACHE_VERSION, os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    cache_dir = cache_dir_for(file_path)
+    cache_file = os.path.join(cache_dir, os.path.basename(file_path) + ".pkl")
+    try:
+        with open(cache_file, "rb") as f:
+            cached_key, planes = pickle.load(f)
+        if cached_key == key:
+            return planes
+    except Exception:
+        # Missing, truncated or unreadable cache: parse the file again
+        pass
+    planes = parse_planos(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump((key, planes), f, protocol=pickle.HIGHEST_PROTOCOL)
     return planes
 
 # -----------------------------------------------------------------------------
@@ -143,33 +116,177 @@ def generate_spiral_fill(polygon: Polygon, spacing: float):
     """Genera espiral adaptada a polígonos arbitrarios en 2D."""
     center = polygon.centroid
     cx, cy = center.x, center.y
-    max_r = max([Point(pt).distance(center) for pt in polygon.exterior.coords])
+    coords = np.asarray(polygon.exterior.coords)
+    max_r = float(np.hypot(coords[:, 0] - cx, coords[:, 1] - cy).max())
     
-    pts = []
-    states = []
-    theta = 0.0
     b = spacing / (2 * np.pi)
     
+    # The angular step depends on the current radius, so the angles are
+    # accumulated sequentially with scalar math only (constants and bound
+    # methods hoisted out of the loop)
+    thetas = []
+    append = thetas.append
+    sqrt = math.sqrt
+    b2 = b * b
+    theta = 0.0
     while b * theta <= max_r:
+        append(theta)
         r = b * theta
-        x = cx + r * np.cos(theta)
-        y = cy + r * np.sin(theta)
-        point = Point(x, y)
-        inside = polygon.contains(point)
-        
-        pts.append((x, y))
-        states.append(inside)
-        
-        denom = np.sqrt((spacing / (2 * np.pi))**2 + r**2)
-        d_theta = spacing / denom
-        theta += d_theta
+        theta += spacing / sqrt(b2 + r * r)
     
+    theta = np.array(thetas)
+    r = b * theta
+    pts = np.column_stack((cx + r * np.cos(theta), cy + r * np.sin(theta)))
+    
+    # Containment of every sample in one vectorized call on the prepared polygon
+    shapely.prepare(polygon)
+    states = shapely.contains_xy(polygon, pts[:, 0], pts[:, 1])
+    
+    return pts, states
+
+def cached_spiral_fill(polygon: Polygon, spacing: float, cache_dir=None):
+    # The spiral only depends on the polygon and the spacing, so it is stored
+    # in cache_dir under a hash of both (and CACHE_VERSION) and loaded back on
+    # later runs. Without cache_dir it is always generated.
+    if cache_dir is None:
+        return generate_spiral_fill(polygon, spacing)
+    digest = hashlib.blake2b(polygon.wkb + struct.pack("<dI", spacing, CACHE_VERSION), digest_size=16)
+    cache_file = os.path.join(cache_dir, digest.hexdigest() + ".npz")
+    try:
+        with np.load(cache_file) as data:
+            return data["xy"], data["states"]
+    except Exception:
+        # Missing, truncated or unreadable cache: generate the spiral again
+        pass
+    pts, states = generate_spiral_fill(polygon, spacing)
+    # Written under a temporary name and renamed, since worker processes may
+    # store the same spiral at the same time
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.npz"
+    np.savez(tmp_file, xy=pts, states=states)
+    os.replace(tmp_file, cache_file)
     return pts, states
 
+def format_linear_block(mm):
+    # N LINEAR lines joined by newlines, formatted with a single % on a
+    # template repeated N times (faster than formatting line by line)
+    return "\n".join([LINEAR_FMT] * len(mm)) % tuple(mm.ravel().tolist())
+
 # -----------------------------------------------------------------------------
 # 3. AeroBasic code generator with spiral pattern
 # -----------------------------------------------------------------------------
-def generate_aerobasic_plane_fill_code(planes, filename="Spiral_Fill.txt"):
+@lru_cache(maxsize=None)
+def plane_basis(nx, ny, nz):
+    # (3, 2) matrix with the in-plane unit vectors u, v of the plane with
+    # normal (nx, ny, nz). Cached: planes usually share a few extrusions.
+    n = np.array([nx, ny, nz], float)
+    n /= np.linalg.norm(n)
+    arb = np.array([1,0,0])
+    if abs(np.dot(arb,n)) > 0.9:
+        arb = np.array([0,1,0])
+    u = np.cross(n, arb); u /= np.linalg.norm(u)
+    v = np.cross(n, u)
+    basis = np.column_stack((u, v))
+    basis.flags.writeable = False
+    return basis
+
+def build_plane_block(idx, plane, origin_xyz, cache_dir=None):
+    # Polygon, spiral and motion text of one plane. Planes are independent, so
+    # this runs in worker processes; returns the plane's motion lines, or None
+    # when no polygon could be formed.
+
+    # Orthonormal frame of the plane as a (3, 2) basis
+    basis = plane_basis(*np.round(np.asarray(plane['extrusion'], float), 12).tolist())
+
+    # Plane origin: all starts then all ends, filled into one array
+    edges = plane['edges']
+    pts3d = np.fromiter(chain((e['start'] for e in edges if e['start']),
+                              (e['end'] for e in edges if e['end'])),
+                        dtype=np.dtype((float, 3)))
+    origin_plane = pts3d.mean(axis=0)
+
+    # Reconstruct polygon with arcs
+    edge_points = []
+    for e in edges:
+        if not e['start'] or not e['end']:
+            continue
+        
+        tipo = e.get('type', '').upper()
+        if 'ARC' in tipo and e.get('radio') and e.get('angulos') and e.get('centro'):
+            extrusion = e.get('extrusion', (0.0, 0.0, 1.0))
+            points_3d = interpolate_arc(e, ARC_RESOLUTION, extrusion)
+            if len(points_3d) >= 2:
+                edge_points.append(points_3d)
+        else:
+            edge_points.append(np.array([e['start'], e['end']], float))
+
+    # Project to 2D: all the points of the plane in a single matmul,
+    # then every edge LineString in one vectorized constructor call
+    lines2d = []
+    if edge_points:
+        counts = [len(pts) for pts in edge_points]
+        points_2d = (np.vstack(edge_points) - origin_plane) @ basis
+        lines2d = shapely.linestrings(points_2d, indices=np.repeat(np.arange(len(counts)), counts))
+
+    # Create polygon. The 1e-5 buffer (not buffer(0), which is empty for
+    # lines) turns the edges into a thin closed band that polygonizes even
+    # with small gaps; the largest face is the contour shrunk by 1e-5 µm,
+    # far below VOXEL_DIAMETER
+    merged = shapely.unary_union(lines2d).buffer(1e-5)
+    polys2d = list(polygonize(merged))
+    if not polys2d:
+        print(f"[ERROR] Plane {idx}: Polygonization failed")
+        return None
+        
+    poly2d = max(polys2d, key=lambda P: P.area)
+    if not poly2d.is_valid:
+        poly2d = poly2d.buffer(0)
+
+    # Generate spiral
+    spacing = VOXEL_DIAMETER * (1-OVERLAP)
+    spiral2d, states = cached_spiral_fill(poly2d, spacing, cache_dir)
+
+    # Convert to 3D
+    spiral3d = origin_plane + spiral2d @ basis.T
+
+    # Speed from color
+    color_val = edges[0].get('color', 256)
+    speed = COLOR_SPEED_MAPPING.get(color_val, 1.0)
+
+    # Generate motion commands
+    motion_blocks = []
+    motion_blocks.append(f"\n' --- Spiral fill Plane {idx} ---")
+    motion_blocks.append(f"$SPEED = {speed:.1f}")
+
+    if len(spiral3d):
+        # Offset and scale every point once
+        mm = (spiral3d - origin_xyz) / 1000
+
+        # Initial positioning
+        motion_blocks.append(LINEAR_FMT % tuple(mm[0].tolist()) + FEED_SUFFIX)
+        motion_blocks.append("WAIT MOVEDONE X Y Z A; dwell 0.1")
+
+        # Spiral traversal: runs of equal shutter state are formatted in
+        # bulk and the shutter commands go between runs (initially closed)
+        toggles = np.flatnonzero(np.diff(states.astype(np.int8), prepend=0))
+        start = 0
+        for k in toggles.tolist():
+            if k > start:
+                motion_blocks.append(format_linear_block(mm[start:k]))
+            if states[k]:
+                motion_blocks.extend(("dwell 0.01", "ShutterOpen", "dwell 0.01"))
+            else:
+                motion_blocks.extend(("ShutterClose", "dwell 0.1"))
+            start = k
+        motion_blocks.append(format_linear_block(mm[start:]))
+        
+        motion_blocks.append("ShutterClose")
+    return motion_blocks
+
+def generate_aerobasic_plane_fill_code(planes, filename="Spiral_Fill.txt", workers=1, cache_dir=None):
+    # workers: processes for the per-plane work (1 = serial, 0 = all cores).
+    # The pool is only used from PARALLEL_MIN_PLANES planes on.
+    # cache_dir: folder for the spiral cache (None = no disk cache)
     # Calculate global origin
     all_pts = []
     for pl in planes:
@@ -179,6 +296,7 @@ def generate_aerobasic_plane_fill_code(planes, filename="Spiral_Fill.txt"):
     origin_x = float(np.min(all_pts[:,0]))
     origin_y = float(np.min(all_pts[:,1]))
     origin_z = float(np.max(all_pts[:,2]))
+    origin_xyz = np.array([origin_x, origin_y, origin_z])
 
     margin_xy = 10.0/1000
     margin_z  = 100.0/1000
@@ -236,101 +354,18 @@ POSOFFSET SET X 0 Y 0 Z 0
 'SCOPETRIG CONTINUOUS   'Trigger the scope to start collecting data 
 'NEVER USE SCOPETRIG AND DATACOLLECT AT THE SAME TIME OR PC WILL CRASH
 """
-    motion_blocks = []
+    # map keeps the blocks in plane order, serial or in parallel
+    jobs = (range(1, len(planes) + 1), planes, repeat(origin_xyz), repeat(cache_dir))
+    if workers == 1 or len(planes) < PARALLEL_MIN_PLANES:
+        plane_blocks = list(map(build_plane_block, *jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as ex:
+            plane_blocks = list(ex.map(build_plane_block, *jobs))
 
-    for idx, plane in enumerate(planes, start=1):
-        # Build orthonormal frame
-        n = np.array(plane['extrusion'], float)
-        n /= np.linalg.norm(n)
-        arb = np.array([1,0,0])
-        if abs(np.dot(arb,n)) > 0.9:
-            arb = np.array([0,1,0])
-        u = np.cross(n, arb); u /= np.linalg.norm(u)
-        v = np.cross(n, u)
-
-        # Plane origin
-        pts3d = np.array([e['start'] for e in plane['edges'] if e['start']] +
-                         [e['end'] for e in plane['edges'] if e['end']])
-        origin_plane = np.mean(pts3d, axis=0)
-
-        # Project to 2D
-        def to2d(p):
-            d = np.array(p) - origin_plane
-            return (float(np.dot(d,u)), float(np.dot(d,v)))
-
-        # Reconstruct polygon with arcs
-        lines2d = []
-        for e in plane['edges']:
-            if not e['start'] or not e['end']:
-                continue
-            
-            tipo = e.get('type', '').upper()
-            if 'ARC' in tipo and e.get('radio') and e.get('angulos') and e.get('centro'):
-                extrusion = e.get('extrusion', (0.0, 0.0, 1.0))
-                points_3d = interpolate_arc(e, ARC_RESOLUTION, extrusion)
-                points_2d = [to2d(p) for p in points_3d]
-                if len(points_2d) >= 2:
-                    lines2d.append(LineString(points_2d))
-            else:
-                start_2d = to2d(e['start'])
-                end_2d = to2d(e['end'])
-                lines2d.append(LineString([start_2d, end_2d]))
-
-        # Create polygon
-        merged = unary_union(lines2d).buffer(1e-5)
-        polys2d = list(polygonize(merged))
-        if not polys2d:
-            print(f"[ERROR] Plane {idx}: Polygonization failed")
-            continue
-            
-        poly2d = max(polys2d, key=lambda P: P.area)
-        if not poly2d.is_valid:
-            poly2d = poly2d.buffer(0)
-
-        # Generate spiral
-        spacing = VOXEL_DIAMETER * (1-OVERLAP)
-        spiral2d, states = generate_spiral_fill(poly2d, spacing)
-
-        # Convert to 3D
-        spiral3d = [tuple(origin_plane + x*u + y*v) for x,y in spiral2d]
-
-        # Speed from color
-        color_val = plane['edges'][0].get('color', 256)
-        speed = COLOR_SPEED_MAPPING.get(color_val, 1.0)
-
-        # Generate motion commands
-        motion_blocks.append(f"\n' --- Spiral fill Plane {idx} ---")
-        motion_blocks.append(f"$SPEED = {speed:.1f}")
-
-        if spiral3d:
-            # Initial positioning
-            x0,y0,z0 = spiral3d[0]
-            motion_blocks.append(
-                f"LINEAR X{(x0-origin_x)/1000:.10f} "
-                f"Y{(y0-origin_y)/1000:.10f} "
-                f"Z{(z0-origin_z)/1000:.10f} F $SPEED"
-            )
-            motion_blocks.append("WAIT MOVEDONE X Y Z A; dwell 0.1")
-
-            # Spiral traversal
-            prev_state = False
-            for (x,y,z), state in zip(spiral3d, states):
-                if state != prev_state:
-                    if state: 
-                        motion_blocks.append("dwell 0.01")
-                        motion_blocks.append("ShutterOpen")
-                        motion_blocks.append("dwell 0.01")
-                    else:
-                        motion_blocks.append("ShutterClose")
-                        motion_blocks.append("dwell 0.1")
-                motion_blocks.append(
-                    f"LINEAR X{(x-origin_x)/1000:.10f} "
-                    f"Y{(y-origin_y)/1000:.10f} "
-                    f"Z{(z-origin_z)/1000:.10f} F $SPEED"
-                )
-                prev_state = state
-            
-            motion_blocks.append("ShutterClose")
+    motion_blocks = []
+    for blocks in plane_blocks:
+        if blocks is not None:
+            motion_blocks.extend(blocks)
 
 
     footer ="""
@@ -343,15 +378,30 @@ VELOCITY OFF
 MSGDISPLAY 0, "Proceso laser completado con exito."
 END"""
 
-    with open(filename, "w") as f:
+    # Same text as header + "\n".join(motion_blocks) + footer, written block by
+    # block through a large buffer instead of joining everything first
+    separators = ["\n"] * len(motion_blocks)
+    separators[:1] = [""]
+    with open(filename, "w", buffering=1 << 20) as f:
         f.write(header)
-        f.write("\n".join(motion_blocks))
+        f.writelines(chain.from_iterable(zip(separators, motion_blocks)))
         f.write(footer)
     print(f"Generated {filename}")
 
 # -----------------------------------------------------------------------------
 # 4. Main
 # -----------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Spiral fill of the processed planes.")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1 = serial, 0 = all cores)")
+    args = parser.parse_args()
+    # Adjust to your working folder:
+    directory = r'C:\Users\Daniel\Desktop\Uni\Python\TFG\GetPlanes\PlanoXZ'
+    os.chdir(directory)
+    input_file = "planos_procesadosXZ.txt"
+    planes = load_planos(input_file)
+    generate_aerobasic_plane_fill_code(planes, filename="TEST.txt", workers=args.workers,
+                                       cache_dir=cache_dir_for(input_file))
+
 if __name__ == "__main__":
-    planes = parse_planos("planos_procesadosXZ.txt")
-    generate_aerobasic_plane_fill_code(planes, filename="TEST.txt")
\ No newline at end of file
+    main()
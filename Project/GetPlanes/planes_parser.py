@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+@author: DKR
+
+Streaming parser for the processed planes file ("PLANOS PROCESADOS:"),
+shared by the raster and spiral fill generators.
+"""
+import re
+import ast
+from functools import lru_cache
+
+# Fast path for the "(x, y, z)" tuples that make up most of the file
+FLOAT_TRIPLE = re.compile(r"\(\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*\)")
+# Only the extrusion is needed from the original entity dict
+ENTITY_EXTRUSION = re.compile(r"'extrusion':\s*(\([^)]*\))")
+
+def parse_angles(text):
+    parts = text.replace("°", "")
+    angle_parts = parts.split("-")
+    if len(angle_parts) >= 2:
+        try:
+            start_angle = float(angle_parts[0].strip())
+            end_angle = float(angle_parts[1].strip())
+            return (start_angle, end_angle)
+        except ValueError:
+            return None
+    return None
+
+@lru_cache(maxsize=4096)
+def _float_triple(text):
+    # Shared vertices repeat as Desde/Hasta of consecutive edges, hence the
+    # cache. Only immutable tuples of floats are cached, never literal_eval
+    # results, which may be mutable and would be shared between edges
+    m = FLOAT_TRIPLE.fullmatch(text)
+    if m:
+        return (float(m[1]), float(m[2]), float(m[3]))
+    return None
+
+def parse_tuple(text):
+    value = _float_triple(text)
+    if value is None:
+        return ast.literal_eval(text)
+    return value
+
+# Edge fields: label -> (key, parser). A parser failure stores None.
+EDGE_FIELDS = {
+    "Tipo": ('type', str),
+    "Color": ('color', int),
+    "Desde": ('start', parse_tuple),
+    "Hasta": ('end', parse_tuple),
+    "Radio": ('radio', float),
+    "Ángulos": ('angulos', parse_angles),
+    "Centro": ('centro', parse_tuple),
+}
+
+def parse_planos(file_path):
+    # Single streaming pass: a line indented 4+ spaces belongs to the current
+    # edge ("Arista") block, anything else closes it and is parsed as a
+    # plane-level line. The line after "Entidad original:" is always taken
+    # as the entity dict, whatever its indentation.
+    planes = []
+    current = None
+    edge = None
+    entity_next = False
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for raw in f:
+            line = raw.strip()
+            if edge is not None:
+                if entity_next:
+                    entity_next = False
+                    m = ENTITY_EXTRUSION.search(line)
+                    try:
+                        edge['extrusion'] = parse_tuple(m[1]) if m else (0.0, 0.0, 1.0)
+                    except Exception:
+                        pass
+                    continue
+                if raw.startswith("    "):
+                    label, _, value = line.partition(":")
+                    if label == "Entidad original":
+                        entity_next = True
+                    elif label in EDGE_FIELDS:
+                        key, parser = EDGE_FIELDS[label]
+                        try: edge[key] = parser(value.strip())
+                        except Exception: edge[key] = None
+                    continue
+                current['edges'].append(edge)
+                edge = None
+            if line.startswith("PLANOS PROCESADOS:"):
+                continue
+            if line.startswith("Plano"):
+                if current: planes.append(current)
+                current = {'metadata': line, 'extrusion': None, 'edges': []}
+                continue
+            if current:
+                if "Vector de extrusión" in line:
+                    try:
+                        current['extrusion'] = parse_tuple(line.split(":",1)[1].strip())
+                    except Exception:
+                        current['extrusion'] = (0.0, 0.0, 1.0)
+                elif line.startswith("Arista"):
+                    edge = {'start': None, 'end': None}
+    if edge is not None: current['edges'].append(edge)
+    if current: planes.append(current)
+    return planes
@@ -4,10 +4,33 @@ Created on Tue Jan 21 11:51:37 2025
 @author: Daniel
 """
 
-from collections import defaultdict
 import ast
+import json
 import os
+import re
 import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, depth_first_order
+
+# Tokens de un dict literal de Python que cambian en JSON: cadenas entre
+# comillas (con sus escapes), paréntesis de tuplas y True/False/None
+PY_LITERAL_TOKEN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[()]|\b(?:True|False|None)\b")
+JSON_TOKEN = {'(': '[', ')': ']', 'True': 'true', 'False': 'false', 'None': 'null'}
+
+# Aristas como estructura de arrays: código de tipo = índice en EDGE_TYPES
+EDGE_TYPES = ('LINE', 'ARC', 'LWPOLYLINE_SEGMENT')
+LINE, ARC, LWPOLYLINE_SEGMENT = range(len(EDGE_TYPES))
+
+def _json_token(m):
+    token = m.group(0)
+    if token[0] in "'\"":
+        body = token[1:-1]
+        # Escapes o comillas dobles dentro de la cadena no se traducen igual
+        # a JSON: esa línea se parsea con ast
+        if '\\' in body or '"' in body:
+            raise ValueError("cadena no traducible a JSON")
+        return '"' + body + '"'
+    return JSON_TOKEN[token]
 
 def read_sections(file_path):
     """Lee y separa las secciones del archivo manteniendo formato original"""
@@ -37,36 +60,52 @@ def compute_plane_normal(points):
     if len(points) < 3:
         return None
     
-    # Convertir a arrays de numpy para cálculos vectoriales
-    np_points = [np.array(p) for p in points]
-    
-    # Buscar 3 puntos no colineales
-    for i in range(len(np_points)-2):
-        p1, p2, p3 = np_points[i], np_points[i+1], np_points[i+2]
-        v1 = p2 - p1
-        v2 = p3 - p1
-        cross_product = np.cross(v1, v2)
-        
-        if np.linalg.norm(cross_product) > 1e-6:  # Evitar colinealidad
-            normal = cross_product / np.linalg.norm(cross_product)
-            return tuple(np.round(normal, 5))
+    # Productos vectoriales de todas las ternas consecutivas a la vez; se
+    # usa la terna menos colineal (mayor norma), orientada como la primera
+    # terna no colineal para conservar el sentido de la normal
+    pts = np.asarray(points, dtype=float)
+    v1 = pts[1:-1] - pts[:-2]
+    v2 = pts[2:] - pts[:-2]
+    crosses = np.cross(v1, v2)
+    norms = np.linalg.norm(crosses, axis=1)
+    idx = np.argmax(norms)
+    if norms[idx] <= 1e-6:  # Todos colineales
+        return None
     
-    return None
+    normal = crosses[idx] / norms[idx]
+    first = np.argmax(norms > 1e-6)
+    if np.dot(normal, crosses[first]) < 0:
+        normal = -normal
+    return tuple(np.round(normal, 5).tolist())
 
-def get_unique_points_from_edges(edges):
-    """Extrae puntos únicos de todas las aristas de un plano."""
-    points = set()
-    for edge in edges:
-        points.add(edge['start'])
-        points.add(edge['end'])
-    return [np.array(p) for p in points]
+def get_unique_points_from_edges(edges, idx):
+    """Extrae puntos únicos de las aristas idx de un plano."""
+    # Inicio y fin intercalados, en el mismo orden en que se añadían al set
+    points = np.stack((edges['start'][idx], edges['end'][idx]), axis=1).reshape(-1, 3)
+    return list(set(map(tuple, points.tolist())))
+
+def _as_lists(obj):
+    """Tuplas ---> listas, para que ambas vías de parse_entity coincidan"""
+    if isinstance(obj, (list, tuple)):
+        return [_as_lists(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: _as_lists(v) for k, v in obj.items()}
+    return obj
+
+def parse_entity(line):
+    """Convierte una línea {...} de entidad (str(dict) de dxftotxt) en dict.
+    Las tuplas quedan como listas"""
+    try:
+        return json.loads(PY_LITERAL_TOKEN.sub(_json_token, line))
+    except ValueError:
+        # Literales que JSON no admite (p. ej. tuplas de un elemento o
+        # cadenas con escapes)
+        return _as_lists(ast.literal_eval(line))
 
 def process_planes_section(planos_lines):
     """Procesa la sección PLANOS extrayendo entidades válidas"""
     direct_planes = []
-    edges = []
-    vertices = defaultdict(set)
-    edge_id_map = {}  # Maps edge index to edge data (optional, if needed elsewhere)
+    rows = []  # (tipo, inicio, fin, color, original, radio, ángulo inicial, ángulo final, centro, polilínea cerrada, segmento)
 
     for line in planos_lines:
         line = line.strip()
@@ -74,12 +113,15 @@ def process_planes_section(planos_lines):
             continue
 
         try:
-            data = ast.literal_eval(line.replace("'", "\""))
+            data = parse_entity(line)
             if data.get('weight', 0) < 0:
                 continue
 
             entity_type = data['type']
             color = data.get('color', 'N/A')
+            if color != 'N/A' and not isinstance(color, (int, float)):
+                # Se conserva tal cual en la salida, pero se avisa
+                print(f"Aviso: color no numérico {color!r} en: {line}")
 
             if entity_type in ['CIRCLE', 'ELLIPSE']:
                 # Existing extrusion adjustment code remains the same
@@ -97,130 +139,131 @@ def process_planes_section(planos_lines):
                     'type': entity_type,
                     'data': data,
                     'original': line,
-                    'extrusion': tuple(np.round(extrusion, 5))
+                    'extrusion': tuple(np.round(extrusion, 5).tolist())
                 })
                 continue
 
-            # Process edges and track their indices
-            edge = None
+            # Una fila por arista
             if entity_type == 'LINE':
-                edge = {
-                    'type': 'LINE',
-                    'start': tuple(data['start_point'][:3]),
-                    'end': tuple(data['end_point'][:3]),
-                    'color': color,
-                    'original': line,
-                    'extra': {}
-                }
+                rows.append((LINE, tuple(data['start_point'][:3]), tuple(data['end_point'][:3]),
+                             color, line, np.nan, np.nan, np.nan, None, False, -1))
             elif entity_type == 'ARC':
-                edge = {
-                    'type': 'ARC',
-                    'start': tuple(data['start_point'][:3]),
-                    'end': tuple(data['end_point'][:3]),
-                    'color': color,
-                    'radius': data['radius'],
-                    'start_angle': data['start_angle'],
-                    'end_angle': data['end_angle'],
-                    'center': tuple(data['center'][:3]),
-                    'original': line,
-                    'extra': {}
-                }
+                rows.append((ARC, tuple(data['start_point'][:3]), tuple(data['end_point'][:3]),
+                             color, line, data['radius'], data['start_angle'], data['end_angle'],
+                             tuple(data['center'][:3]), False, -1))
             elif entity_type == 'LWPOLYLINE':
                 points = [tuple(p[:3]) for p in data['points']]
-                for i in range(len(points)-1):
-                    edge = {
-                        'type': 'LWPOLYLINE_SEGMENT',
-                        'start': points[i],
-                        'end': points[i+1],
-                        'color': color,
-                        'original': line,
-                        'extra': {
-                            'polyline_closed': data.get('is_closed', False),
-                            'segment_index': i
-                        }
-                    }
-                    edges.append(edge)
-                    edge_idx = len(edges) - 1
-                    vertices[edge['start']].add(edge_idx)
-                    vertices[edge['end']].add(edge_idx)
-
-            if edge and entity_type != 'LWPOLYLINE':  # LWPOLYLINE already handled
-                edges.append(edge)
-                edge_idx = len(edges) - 1
-                vertices[edge['start']].add(edge_idx)
-                vertices[edge['end']].add(edge_idx)
+                closed = bool(data.get('is_closed', False))
+                rows.extend((LWPOLYLINE_SEGMENT, points[i], points[i+1], color, line,
+                             np.nan, np.nan, np.nan, None, closed, i)
+                            for i in range(len(points)-1))
 
         except Exception as e:
             print(f"Error procesando línea: {line}\nError: {str(e)}")
 
-    return direct_planes, edges, vertices, edge_id_map
+    edges = edges_to_arrays(rows)
 
-def group_connected_edges(edges, vertices, edge_id_map):
-    """Agrupa aristas conectadas usando BFS y calcula vector normal"""
-    visited = set()
-    planes = []
+    # Vértices como IDs enteros: fila i = (vértice inicial, vértice final) de
+    # la arista i. Los extremos se comparan por igualdad exacta (+0.0
+    # unifica -0.0 y 0.0, como hacía la comparación de tuplas)
+    if len(edges['type']):
+        endpoints = np.stack((edges['start'], edges['end']), axis=1).reshape(-1, 3) + 0.0
+        _, vertex_ids = np.unique(endpoints, axis=0, return_inverse=True)
+        vertices = vertex_ids.reshape(-1, 2)
+    else:
+        vertices = np.empty((0, 2), dtype=np.intp)
 
-    for edge_idx, edge in enumerate(edges):
-        if edge_idx not in visited:
-            current_plane = []
-            stack = [edge_idx]
-
-            while stack:
-                current_edge_idx = stack.pop()
-                if current_edge_idx not in visited:
-                    visited.add(current_edge_idx)  # Track by index (integer)
-                    current_edge = edges[current_edge_idx]
-                    current_plane.append(current_edge)
-
-                    # Get connection points from the current edge
-                    connection_points = []
-                    if current_edge['type'] in ['LINE', 'ARC', 'LWPOLYLINE_SEGMENT']:
-                        connection_points = [current_edge['start'], current_edge['end']]
-
-                    # Find all edges connected to these points
-                    for point in connection_points:
-                        for neighbor_idx in vertices.get(point, []):
-                            if neighbor_idx not in visited:
-                                stack.append(neighbor_idx)
-
-            if current_plane:
-                points = get_unique_points_from_edges(current_plane)
-                extrusion_vector = compute_plane_normal(points)
-                planes.append({
-                    'edges': current_plane,
-                    'extrusion': extrusion_vector
-                })
+    return direct_planes, edges, vertices
+
+def edges_to_arrays(rows):
+    """Convierte las filas de aristas en un dict de arrays (una columna por campo)"""
+    (kinds, starts, ends, colors, originals, radii, start_angles, end_angles,
+     centers, closed, segment_index) = zip(*rows) if rows else ((),) * 11
+    return {
+        'type': np.array(kinds, dtype=np.uint8),
+        'start': np.array(starts, dtype=float).reshape(-1, 3),
+        'end': np.array(ends, dtype=float).reshape(-1, 3),
+        # Valores tal como venían en la entidad (p. ej. enteros), para la salida
+        'start_text': list(starts),
+        'end_text': list(ends),
+        'color': list(colors),
+        'original': list(originals),
+        # Campos de ARC (NaN / None en el resto)
+        'radius': np.array(radii, dtype=float),
+        'start_angle': np.array(start_angles, dtype=float),
+        'end_angle': np.array(end_angles, dtype=float),
+        'center': list(centers),
+        # Campos de LWPOLYLINE_SEGMENT
+        'polyline_closed': np.array(closed, dtype=bool),
+        'segment_index': np.array(segment_index, dtype=np.int32),
+    }
+
+def group_connected_edges(edges, vertices):
+    """Agrupa aristas conectadas (componentes conexas) y calcula vector normal"""
+    n_edges = len(edges['type'])
+    if not n_edges:
+        return []
+    n_vertices = int(vertices.max()) + 1
+    n_nodes = n_edges + n_vertices
+
+    # Grafo bipartito arista-vértice: nodos 0..n_edges-1 son aristas y el
+    # resto vértices. Cada arista se guarda como (arista -> vértice final) y
+    # (vértice inicial -> arista): el recorrido en profundidad sale de cada
+    # arista por su extremo final y encadena las aristas en su sentido, como
+    # el DFS original. Las aristas invertidas se alcanzan por la traspuesta
+    edge_ids = np.arange(n_edges)
+    graph = csr_matrix((np.ones(2 * n_edges, dtype=np.int8),
+                        (np.concatenate((edge_ids, n_edges + vertices[:, 0])),
+                         np.concatenate((n_edges + vertices[:, 1], edge_ids)))),
+                       shape=(n_nodes, n_nodes))
+    _, labels = connected_components(graph, directed=False)
+
+    # Las etiquetas siguen el orden de la primera arista de cada componente,
+    # así que los planos salen en el mismo orden. Las aristas de cada plano
+    # se ordenan recorriéndolo desde esa arista: Establish_Hierarchy construye
+    # el contorno con los puntos "Desde" en este orden
+    _, roots = np.unique(labels[:n_edges], return_index=True)
+    planes = []
+    for root in roots.tolist():
+        order = depth_first_order(graph, root, directed=False, return_predecessors=False)
+        group = order[order < n_edges]
+        points = get_unique_points_from_edges(edges, group)
+        extrusion_vector = compute_plane_normal(points)
+        planes.append({
+            'edges': group,  # índices en las columnas de edges, en orden de recorrido
+            'extrusion': extrusion_vector
+        })
 
     return planes
 
 
-def format_edge(edge):
-    """Formatea una arista para su visualización"""
-    details = []
-    details.append(f"Tipo: {edge['type']}")
-    details.append(f"Color: {edge['color']}")
-    
-    if edge['type'] == 'LINE':
-        details.append(f"Desde: {edge['start']}")
-        details.append(f"Hasta: {edge['end']}")
-        
-    elif edge['type'] == 'ARC':
-        details.append(f"Desde: {edge['start']}")
-        details.append(f"Hasta: {edge['end']}")
-        details.append(f"Radio: {edge['radius']:.5f}")
-        details.append(f"Ángulos: {edge['start_angle']:.5f}° - {edge['end_angle']:.5f}°")
-        details.append(f"Centro: {edge['center']}")
-        
-    elif edge['type'] == 'LWPOLYLINE_SEGMENT':
-        details.append(f"Segmento: {edge['extra']['segment_index'] + 1}")
-        details.append(f"Desde: {edge['start']}")
-        details.append(f"Hasta: {edge['end']}")
-        details.append(f"Polilínea cerrada: {'Sí' if edge['extra']['polyline_closed'] else 'No'}")
-    
-    return "\n    ".join(details)
+def format_edges(edges):
+    """Formatea todas las aristas para su visualización (una cadena por arista)"""
+    # Coordenadas y color con su representación original
+    starts = edges['start_text']
+    ends = edges['end_text']
+    centers = edges['center']
+    colors = edges['color']
+
+    formatted = []
+    for i, kind in enumerate(edges['type'].tolist()):
+        details = [f"Tipo: {EDGE_TYPES[kind]}", f"Color: {colors[i]}"]
+        if kind == LWPOLYLINE_SEGMENT:
+            details.append(f"Segmento: {edges['segment_index'][i] + 1}")
+        details.append(f"Desde: {starts[i]}")
+        details.append(f"Hasta: {ends[i]}")
+        if kind == ARC:
+            details.append(f"Radio: {edges['radius'][i]:.5f}")
+            details.append(f"Ángulos: {edges['start_angle'][i]:.5f}° - {edges['end_angle'][i]:.5f}°")
+            details.append(f"Centro: {centers[i]}")
+        elif kind == LWPOLYLINE_SEGMENT:
+            details.append(f"Polilínea cerrada: {'Sí' if edges['polyline_closed'][i] else 'No'}")
+        formatted.append("\n    ".join(details))
+    return formatted
 
-def write_output(output_path, trayectorias, direct_planes, grouped_planes):
+def write_output(output_path, trayectorias, direct_planes, grouped_planes, edges):
     """Escribe el archivo de salida incluyendo vectores de extrusión"""
+    edge_text = format_edges(edges)
     with open(output_path, 'w', encoding='utf-8') as f:
         f.writelines(trayectorias)
         f.write("\nPLANOS PROCESADOS:\n")
@@ -247,10 +290,10 @@ def write_output(output_path, trayectorias, direct_planes, grouped_planes):
             f.write(f"Total de aristas: {len(plane['edges'])}\n")
             f.write(f"Vector de extrusión calculado: {plane['extrusion']}\n")
             
-            for idx, edge in enumerate(plane['edges'], 1):
+            for idx, i in enumerate(plane['edges'].tolist(), 1):
                 f.write(f"\n  Arista {idx}:\n")
-                f.write(f"    {format_edge(edge)}\n")
-                f.write(f"    Entidad original:\n    {edge['original']}\n")
+                f.write(f"    {edge_text[i]}\n")
+                f.write(f"    Entidad original:\n    {edges['original'][i]}\n")
             
             plano_counter += 1
 
@@ -261,10 +304,10 @@ def main():
     output_file = 'planos_procesadosDiagPlane.txt'
     
     trayectorias, planos = read_sections(input_file)
-    direct_planes, edges, vertices, edge_id_map = process_planes_section(planos)
-    grouped_planes = group_connected_edges(edges, vertices, edge_id_map)
+    direct_planes, edges, vertices = process_planes_section(planos)
+    grouped_planes = group_connected_edges(edges, vertices)
     
-    write_output(output_file, trayectorias, direct_planes, grouped_planes)
+    write_output(output_file, trayectorias, direct_planes, grouped_planes, edges)
     
     print(f"Proceso completado exitosamente!")
     print(f"- Planos directos: {len(direct_planes)}")
@@ -7,9 +7,16 @@ Created on Thu Jan 23 15:35:44 2025
 
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.interpolate import splprep, splev, interp1d
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from scipy.interpolate import splprep, splev
 import ast
 import os 
+import re
+import pickle
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from contextlib import nullcontext
 # Index Colors (From AutoCAD) ---> Speed Dictionary 
 COLOR_SPEED_MAPPING = {         #mm/s
     1: 0.2,                     #Red
@@ -24,9 +31,43 @@ COLOR_SPEED_MAPPING = {         #mm/s
     9: 2                        #Light-Gray
 } 
 
+# Tabla densa índice de color ---> velocidad (1.0 para colores sin asignar)
+SPEED_LUT = np.full(257, 1.0)
+SPEED_LUT[list(COLOR_SPEED_MAPPING)] = list(COLOR_SPEED_MAPPING.values())
+
+def color_speeds(entity_params):
+    """Velocidades de un grupo de entidades a partir de su color, de una vez"""
+    colors = np.fromiter((p.get('color', 256) for p in entity_params), dtype=np.int64, count=len(entity_params))
+    in_range = (colors >= 0) & (colors < len(SPEED_LUT))
+    return np.where(in_range, SPEED_LUT[np.where(in_range, colors, 256)], 1.0).tolist()
+
 # ==================================================
 # 1. FUNCIÓN PARA LEER ARCHIVOS DE PARÁMETROS
 # ==================================================
+# Vía rápida para las tuplas "(x, y, z)", que son casi todos los valores
+FLOAT_TRIPLE = re.compile(r"\(\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*\)")
+
+@lru_cache(maxsize=4096)
+def _float_triple(text):
+    # Solo se cachean tuplas de floats (inmutables); las listas y los
+    # resultados de literal_eval se compartirían entre entidades
+    m = FLOAT_TRIPLE.fullmatch(text)
+    if m:
+        return (float(m[1]), float(m[2]), float(m[3]))
+    return None
+
+def parse_literal(text):
+    """Parsea una tupla o lista de tuplas de coordenadas sin pasar por ast"""
+    value = _float_triple(text)
+    if value is not None:
+        return value
+    if text.startswith('[') and text.endswith(']'):
+        triples = FLOAT_TRIPLE.findall(text)
+        # Solo si la lista está formada exclusivamente por tuplas (x, y, z)
+        if not FLOAT_TRIPLE.sub('', text[1:-1]).replace(',', '').strip():
+            return [(float(x), float(y), float(z)) for x, y, z in triples]
+    return ast.literal_eval(text)
+
 def parse_parameters(Input_File):
     """Lee y parsea archivos de parámetros de geometrías complejas"""
     entities = {}
@@ -57,7 +98,7 @@ def parse_parameters(Input_File):
                 
                 try:
                     if '[' in value or '(' in value:
-                        parsed_value = ast.literal_eval(value)
+                        parsed_value = parse_literal(value)
                     else:
                         try:
                             parsed_value = float(value) if '.' in value else int(value)
@@ -69,6 +110,32 @@ def parse_parameters(Input_File):
 
     return entities
 
+# Parámetros ya parseados de ejecuciones anteriores, en una carpeta junto al
+# archivo de entrada. CACHE_VERSION se incrementa cuando cambia parse_parameters
+# para no reutilizar cachés antiguas
+CACHE_DIR = "param_cache"
+CACHE_VERSION = 1
+
+def load_parameters(Input_File):
+    """parse_parameters con caché en disco (pickle) válida mientras el archivo no cambie"""
+    stat = os.stat(Input_File)
+    key = (CACHE_VERSION, os.path.abspath(Input_File), stat.st_mtime_ns, stat.st_size)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(Input_File)), CACHE_DIR)
+    cache_file = os.path.join(cache_dir, os.path.basename(Input_File) + ".pkl")
+    try:
+        with open(cache_file, "rb") as f:
+            cached_key, entities = pickle.load(f)
+        if cached_key == key:
+            return entities
+    except Exception:
+        # Caché inexistente, truncada o ilegible: se vuelve a parsear
+        pass
+    entities = parse_parameters(Input_File)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump((key, entities), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return entities
+
 # ==================================================
 # 2. FUNCIONES PARA GENERAR TRAYECTORIAS
 # ==================================================
@@ -108,57 +175,103 @@ def generate_parametric_helix(params):
     # Radio variable de radio_base a radio_top
     r = radio_base + (radio_top - radio_base) / (2 * np.pi * turns) * t
     
-    # Coordenadas de la hélice
-    x = axis_base[0] + r * np.cos(theta0 + d * t) * u[0] + r * np.sin(theta0 + d * t) * v[0] + (H / (2 * np.pi * turns) * t) * axis_vector[0]
-    y = axis_base[1] + r * np.cos(theta0 + d * t) * u[1] + r * np.sin(theta0 + d * t) * v[1] + (H / (2 * np.pi * turns) * t) * axis_vector[1]
-    z = axis_base[2] + r * np.cos(theta0 + d * t) * u[2] + r * np.sin(theta0 + d * t) * v[2] + (H / (2 * np.pi * turns) * t) * axis_vector[2]
+    # Coordenadas de la hélice: coeficientes (r·cos, r·sin, altura) de cada
+    # punto sobre la base (u, v, axis_vector), en un único producto matricial
+    ang = theta0 + d * t
+    coeffs = np.column_stack((r * np.cos(ang), r * np.sin(ang), H / (2 * np.pi * turns) * t))
+    P = axis_base + coeffs @ np.vstack((u, v, axis_vector))
     
-    return x, y, z
+    return P[:, 0], P[:, 1], P[:, 2]
+
+def helix_length(params):
+    """Longitud de arco de la hélice cónica en forma cerrada"""
+    turns = params["turns"]
+    radio_base = params["radio_base"]
+    radio_top = params["radius"]
+    phi = 2 * np.pi * turns
+    c = params["turn_height"] / (2 * np.pi)     # avance axial por radián
+    k = (radio_top - radio_base) / phi          # variación del radio por radián
+    if abs(k) < 1e-12:
+        # Hélice cilíndrica: L = vueltas * sqrt((2·pi·r)^2 + paso^2)
+        return float(turns * np.hypot(2 * np.pi * radio_base, params["turn_height"]))
+    # ds = sqrt(r^2 + k^2 + c^2) dphi, con dr = k dphi
+    a = np.hypot(k, c)
+    def F(r):
+        return r * np.hypot(r, a) + a * a * np.arcsinh(r / a)
+    return float((F(radio_top) - F(radio_base)) / (2 * k))
 
 def generate_voxels(x, y, z, VOXEL_DIAMETER=0.2, overlap=0.5):
-    """Calcula centros de vóxeles para cubrir la trayectoria"""
+    """Calcula centros de vóxeles para cubrir la trayectoria, como array (N, 3)"""
     # Cálculo de longitud de arco
     dx = np.diff(x)
     dy = np.diff(y)
     dz = np.diff(z)
     distances = np.sqrt(dx**2 + dy**2 + dz**2)
-    s = np.insert(np.cumsum(distances), 0, 0)
-    
-    # Interpolación para muestreo equiespaciado
-    fx = interp1d(s, x, 'linear')
-    fy = interp1d(s, y, 'linear')
-    fz = interp1d(s, z, 'linear')
+    s = np.concatenate(([0.0], np.cumsum(distances)))
     
     # Espaciado entre centros de vóxeles
     step = VOXEL_DIAMETER * (1 - overlap)
     s_samples = np.arange(0, s[-1], step)
     
-    return fx(s_samples), fy(s_samples), fz(s_samples)
+    # Interpolación lineal para muestreo equiespaciado, escrita por columnas
+    # directamente en el array de vóxeles
+    voxels = np.empty((len(s_samples), 3))
+    for i, coord in enumerate((x, y, z)):
+        voxels[:, i] = np.interp(s_samples, s, coord)
+    return voxels
+
+# Por debajo de este número de hélices no compensa arrancar procesos
+PARALLEL_MIN_HELICES = 8
+
+def build_helix_trajectory(helix_params, VOXEL_DIAMETER=0.2, overlap=0.5):
+    """Hélice paramétrica, vóxeles y longitud de una entidad HELIX.
+    Cada hélice es independiente, así que puede calcularse en otro proceso;
+    si falta un parámetro lanza KeyError"""
+    x_param, y_param, z_param = generate_parametric_helix(helix_params)
+    return {
+        'type': 'HELIX',
+        'points': (x_param, y_param, z_param),
+        'voxels': generate_voxels(x_param, y_param, z_param, VOXEL_DIAMETER, overlap),  # (N, 3)
+        'length': helix_length(helix_params),
+    }
 
 # ==================================================
 # 3. VISUALIZACIÓN 3D
 # ==================================================
+# Figura y ejes reutilizados entre llamadas mientras la ventana siga abierta
+_FIG = None
+_AX = None
+
 def plot_trajectories(trajectories):
     """Crea una visualización 3D de las distintas trayectorias"""
-    fig = plt.figure(figsize=(16, 12))
-    ax = fig.add_subplot(111, projection='3d')
+    global _FIG, _AX
+    if _FIG is None or not plt.fignum_exists(_FIG.number):
+        _FIG = plt.figure(figsize=(16, 12))
+        _AX = _FIG.add_subplot(111, projection='3d')
+    else:
+        _AX.cla()
+    ax = _AX
     
     colors = ['C0', 'C1', 'C2', 'C3', 'C4', 'C5']
     
+    # Todas las trayectorias como polilíneas (N_i, 3) de una única colección,
+    # que se proyecta de una vez en lugar de un artista Line3D por trayectoria
+    segments = []
+    segment_colors = []
     for i, traj in enumerate(trajectories):
-        label = traj['label']
-        color = colors[i % len(colors)]
-        
         if traj['type'] == 'HELIX':
-            x, y, z = traj['points']
-            ax.plot(x, y, z, linewidth=2, color=color, alpha=0.6, label=f'{label} trajectory')
+            segments.append(np.column_stack(traj['points']))
         elif traj['type'] == 'LINE':
-            start = traj['start']
-            end = traj['end']
-            x = [start[0], end[0]]
-            y = [start[1], end[1]]
-            z = [start[2], end[2]]
-            ax.plot(x, y, z, linewidth=2, color=color, alpha=0.6, label=f'{label} trajectory')
+            segments.append(np.array([traj['start'], traj['end']], dtype=float))
+        else:
+            continue
+        segment_colors.append(colors[i % len(colors)])
+
+    if segments:
+        ax.add_collection3d(Line3DCollection(segments, colors=segment_colors, linewidths=2, alpha=0.6))
+        # Los límites de los ejes se ajustan con los mismos puntos apilados
+        all_points = np.concatenate(segments)
+        ax.auto_scale_xyz(all_points[:, 0], all_points[:, 1], all_points[:, 2])
 
     ax.set_xlabel('X [µm]', fontsize=12)
     ax.set_ylabel('Y [µm]', fontsize=12)
@@ -173,24 +286,13 @@ def plot_trajectories(trajectories):
 # ==================================================
 def generate_aerobasic_generic_laser(trajectories, filename="CAD2AB_0605.txt"):
     """Genera código AeroBasic para múltiples trayectorias"""
-    # Determinar el origen global considerando todas las trayectorias
-    all_points = []
-    for traj in trajectories:
-        if traj['type'] == 'HELIX':
-            x, y, z = traj['points']
-            all_points.extend(zip(x, y, z))
-        elif traj['type'] == 'LINE':
-            all_points.append(tuple(traj['start']))
-            all_points.append(tuple(traj['end']))
-    
-    all_points = np.array(all_points)
-    all_x = all_points[:, 0]
-    all_y = all_points[:, 1]
-    all_z = all_points[:, 2]
-    
-    origin_x = min(all_x)
-    origin_y = min(all_y)
-    origin_z = max(all_z)
+    # Determinar el origen global considerando todas las trayectorias,
+    # apiladas en un único array (N, 3)
+    all_points = np.vstack([np.column_stack(traj['points']) if traj['type'] == 'HELIX'
+                            else np.array([traj['start'], traj['end']], dtype=float)
+                            for traj in trajectories])
+    origin = np.array([all_points[:, 0].min(), all_points[:, 1].min(), all_points[:, 2].max()])
+    origin_x, origin_y, origin_z = origin.tolist()
     
     # Márgenes relativos al origen (coordenadas del código) en mm
     margin_xy = 10.0 / 1000
@@ -257,49 +359,41 @@ POSOFFSET SET X 0 Y 0 Z 0
         label = traj['label']
         speed = traj['speed']
         motion_blocks.append(f"\n' --- Inicio de la trayectoria {label} ---")
-        motion_blocks.append(f"$SPEED = {speed:.1f}")
+        motion_blocks.append("$SPEED = %.1f" % speed)
         
         if traj['type'] == 'HELIX':
-            # Para hélices, mantenemos el código proporcionado originalmente
-            x_vox, y_vox, z_vox = traj['voxels']
-            num_points = len(x_vox)
+            # Vóxeles (N, 3) relativos al origen y convertidos de um a mm de una vez
+            voxels_mm = (traj['voxels'] - origin) / 1000
+            num_points = len(voxels_mm)
             
-            # Ajustar coordenadas relativas al origen
-            x_adj = [x - origin_x for x in x_vox]
-            y_adj = [y - origin_y for y in y_vox]
-            z_adj = [z - origin_z for z in z_vox]
-            
-            for i, (x, y, z) in enumerate(zip(x_adj, y_adj, z_adj)):
-                # Convertir de um a mm
-                x_mm = x / 1000
-                y_mm = y / 1000
-                z_mm = z / 1000
-                motion_blocks.append(f"LINEAR X{x_mm:.10f} Y{y_mm:.10f} Z{z_mm:.10f} F $SPEED  ' Punto {i+1}/{num_points}")
-                if i == 0:
-                    motion_blocks.append("WAIT MOVEDONE X Y Z A")
-                    motion_blocks.append("dwell 0.1")
-                    motion_blocks.append("ShutterOpen")
+            if num_points:
+                # Metadatos para estimar el tiempo de la hélice sin recorrer sus
+                # tramos: número de puntos y longitud de arco (mm)
+                motion_blocks.append("' HELIX_META puntos=%d longitud=%.10f" % (num_points, traj['length'] / 1000))
+                # Todas las líneas LINEAR de la hélice con un único % sobre la
+                # plantilla repetida, y unidas en un solo bloque de texto
+                template = "LINEAR X%%.10f Y%%.10f Z%%.10f F $SPEED  ' Punto %%d/%d" % num_points
+                values = tuple(chain.from_iterable(zip(*voxels_mm.T.tolist(), range(1, num_points + 1))))
+                motion_blocks.append(template % values[:4])
+                motion_blocks.append("WAIT MOVEDONE X Y Z A")
+                motion_blocks.append("dwell 0.1")
+                motion_blocks.append("ShutterOpen")
+                if num_points > 1:
+                    motion_blocks.append("\n".join([template] * (num_points - 1)) % values[4:])
             
             motion_blocks.append("ShutterClose")
         
         elif traj['type'] == 'LINE':
-            start = traj['start']
-            end = traj['end']
-            
-            # Ajustar coordenadas relativas al origen y convertir de um a mm
-            x_start_mm = (start[0] - origin_x) / 1000
-            y_start_mm = (start[1] - origin_y) / 1000
-            z_start_mm = (start[2] - origin_z) / 1000
+            # Ajustar inicio y fin relativos al origen y convertir de um a mm,
+            # con la misma resta vectorial que los vóxeles de las hélices
+            endpoints_mm = (np.array([traj['start'], traj['end']], dtype=float) - origin) / 1000
+            (x_start_mm, y_start_mm, z_start_mm), (x_end_mm, y_end_mm, z_end_mm) = endpoints_mm.tolist()
             
-            x_end_mm = (end[0] - origin_x) / 1000
-            y_end_mm = (end[1] - origin_y) / 1000
-            z_end_mm = (end[2] - origin_z) / 1000
-            
-            motion_blocks.append(f"LINEAR X{x_start_mm:.10f} Y{y_start_mm:.10f} Z{z_start_mm:.10f} F $SPEED ' Posicionarse al inicio")
-            motion_blocks.append(f"$SPEED = {speed:.1f}")
+            motion_blocks.append("LINEAR X%.10f Y%.10f Z%.10f F $SPEED ' Posicionarse al inicio" % (x_start_mm, y_start_mm, z_start_mm))
+            motion_blocks.append("$SPEED = %.1f" % speed)
             motion_blocks.append("dwell 0.1")
             motion_blocks.append("ShutterOpen")
-            motion_blocks.append(f"LINEAR X{x_end_mm:.10f} Y{y_end_mm:.10f} Z{z_end_mm:.10f} F $SPEED ' Movimiento lineal a lo largo de la linea")
+            motion_blocks.append("LINEAR X%.10f Y%.10f Z%.10f F $SPEED ' Movimiento lineal a lo largo de la linea" % (x_end_mm, y_end_mm, z_end_mm))
             motion_blocks.append("ShutterClose")
     
     footer = """
@@ -314,9 +408,13 @@ VELOCITY OFF
 MSGDISPLAY 0, "Proceso laser completado con exito."
 END"""
 
-    with open(filename, "w") as f:
+    # Mismo texto que header + "\n".join(motion_blocks) + footer, escrito bloque
+    # a bloque a través de un buffer grande sin construir la cadena completa
+    separators = ["\n"] * len(motion_blocks)
+    separators[:1] = [""]
+    with open(filename, "w", buffering=1 << 20) as f:
         f.write(header)
-        f.write("\n".join(motion_blocks))
+        f.writelines(chain.from_iterable(zip(separators, motion_blocks)))
         f.write(footer)
 
     print(f"Script generado: {filename}")
@@ -333,52 +431,53 @@ if __name__ == "__main__":
     OVERLAP = 0.5 
     
     # Paso 1: Leer archivo
-    entities = parse_parameters(Input_File)
+    entities = load_parameters(Input_File)
     
     trajectories = []
 
     # Procesar entidades HELIX
     if "HELIX" in entities:
-        for idx, helix_params in enumerate(entities["HELIX"]):
-            try:
-                # Generar hélice paramétrica
-                x_param, y_param, z_param = generate_parametric_helix(helix_params)
-                
-                # Calcular vóxeles
-                x_vox, y_vox, z_vox = generate_voxels(x_param, y_param, z_param, VOXEL_DIAMETER, OVERLAP)
-                
-                # Mapeo color-velocidad
-                color_value = helix_params.get('color', 256)
-                speed = COLOR_SPEED_MAPPING.get(color_value, 1.0)
-                
-                trajectories.append({
-                    'type': 'HELIX',
-                    'points': (x_param, y_param, z_param),
-                    'voxels': (x_vox, y_vox, z_vox),
-                    'label': f"HELIX_{idx+1}",
-                    'speed': speed
-                })
-            except KeyError as e:
-                print(f"Error en HELIX {idx+1}: El parámetro {e} no está definido.")
+        # Mapeo color-velocidad de todas las hélices
+        helix_speeds = color_speeds(entities["HELIX"])
+        
+        # Generar hélices paramétricas y sus vóxeles, en paralelo si hay
+        # suficientes. Cada hélice queda como una llamada que devuelve su
+        # resultado (o lanza su KeyError), en el orden de las entidades
+        parallel = len(entities["HELIX"]) >= PARALLEL_MIN_HELICES
+        with ProcessPoolExecutor() if parallel else nullcontext() as ex:
+            if ex is None:
+                pending = [partial(build_helix_trajectory, helix_params, VOXEL_DIAMETER, OVERLAP)
+                           for helix_params in entities["HELIX"]]
+            else:
+                pending = [ex.submit(build_helix_trajectory, helix_params, VOXEL_DIAMETER, OVERLAP).result
+                           for helix_params in entities["HELIX"]]
+            
+            for idx, get_helix in enumerate(pending):
+                try:
+                    helix = get_helix()
+                except KeyError as e:
+                    print(f"Error en HELIX {idx+1}: El parámetro {e} no está definido.")
+                    continue
+                helix['label'] = f"HELIX_{idx+1}"
+                helix['speed'] = helix_speeds[idx]
+                trajectories.append(helix)
     
     # Procesar entidades LINE
     if "LINE" in entities:
+        # Mapeo color-velocidad de todas las líneas
+        line_speeds = color_speeds(entities["LINE"])
         for idx, line_params in enumerate(entities["LINE"]):
             try:
                 # Extraer puntos de inicio y fin
                 start = line_params["start"]
                 end = line_params["end"]
                 
-                # Mapeo color-velocidad
-                color_value = line_params.get('color', 256)
-                speed = COLOR_SPEED_MAPPING.get(color_value, 1.0)
-                
                 trajectories.append({
                     'type': 'LINE',
                     'start': start,
                     'end': end,
                     'label': f"LINE_{idx+1}",
-                    'speed': speed
+                    'speed': line_speeds[idx]
                 })
             except KeyError as e:
                 print(f"Error en LINE {idx+1}: El parámetro {e} no está definido.")
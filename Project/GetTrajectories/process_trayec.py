@@ -2,6 +2,7 @@ import os
 import ast
 import re
 from collections import defaultdict
+from itertools import repeat
 from numbers import Real
 from typing import Any
 
@@ -13,14 +14,25 @@ def round_numbers(obj: Any, precision: int) -> Any:
     if isinstance(obj, Real):
         return round(obj, precision)
     elif isinstance(obj, (list, tuple)):
+        # Secuencias planas de floats (coordenadas, knots...): se redondean de
+        # una vez con map en lugar de una llamada recursiva por elemento
+        if all(type(x) is float for x in obj):
+            return type(obj)(map(round, obj, repeat(precision)))
         return type(obj)(round_numbers(x, precision) for x in obj)
     elif isinstance(obj, dict):
         return {k: round_numbers(v, precision) for k, v in obj.items()}
     return obj
 
+# array('d', [...]) de ezdxf ---> lista
+ARRAY_LITERAL = re.compile(r"array\('d', (\[.*?\])\)")
+
 def clean_line(line: str) -> str:
-    line = re.sub(r"array\('d', (\[.*?\])\)", r"\1", line)
-    line = line.replace("'None'", "None")
+    # La mayoría de líneas no contienen ninguno de los dos patrones: una
+    # búsqueda de subcadena evita la sustitución en ese caso
+    if "array(" in line:
+        line = ARRAY_LITERAL.sub(r"\1", line)
+    if "'None'" in line:
+        line = line.replace("'None'", "None")
     return line
 
 def process_trayectorias(input_file: str, output_file: str, precision: int = 3) -> None:
@@ -123,21 +135,25 @@ def process_trayectorias(input_file: str, output_file: str, precision: int = 3)
         
         parametros[tipo].append(params)
     
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # Cada tipo de entidad se vuelca con un único writelines sobre un buffer grande
+    with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
         for entity_type, entities in parametros.items():
             if not entities:
                 continue
-            f.write(f"===== {entity_type} =====\n")
+            lines = [f"===== {entity_type} =====\n"]
             for idx, entity in enumerate(entities, 1):
-                f.write(f"Entidad {idx}:\n")
+                lines.append(f"Entidad {idx}:\n")
                 for key, value in entity.items():
                     if key == "type":
                         continue
-                    if isinstance(value, (list, tuple)):
-                        value = [round(x, precision) if isinstance(x, Real) else x for x in value]
-                    f.write(f"  - {key}: {value}\n")    
-                f.write("\n")
-            f.write("\n")
+                    # Los valores ya se redondearon al leerlos; las tuplas se
+                    # escriben como listas
+                    if isinstance(value, tuple):
+                        value = list(value)
+                    lines.append(f"  - {key}: {value}\n")
+                lines.append("\n")
+            lines.append("\n")
+            f.writelines(lines)
         print(f"Datos extraídos y guardados en {output_file}")
 
 
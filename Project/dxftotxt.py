@@ -8,6 +8,102 @@ Created on Mon Jan 20 11:50:48 2025
 import ezdxf
 import os
 
+def round_coordinates(coords):
+    if isinstance(coords, (float, int)):
+        return round(coords, 8)
+    if coords is None:
+        return None
+    return tuple(round(coord, 8) for coord in coords)
+
+# --- Manejadores por tipo de entidad ---
+# Cada uno recibe la entidad y su namespace DXF (ya leído una vez) y devuelve
+# los campos específicos del tipo
+
+def _line_data(entity, dxf):
+    return {
+        "start_point": round_coordinates(dxf.start),
+        "end_point": round_coordinates(dxf.end),
+    }
+
+def _arc_data(entity, dxf):
+    return {
+        "center": round_coordinates(dxf.center),
+        "radius": round_coordinates(dxf.radius),
+        "start_point": round_coordinates(entity.start_point),
+        "end_point": round_coordinates(entity.end_point),
+        "start_angle": round_coordinates(dxf.start_angle),
+        "end_angle": round_coordinates(dxf.end_angle),
+        "extrusion": round_coordinates(dxf.extrusion), 
+    }
+
+def _spline_data(entity, dxf):
+    knots = getattr(entity, 'knots', None)
+    weights = getattr(entity, 'weights', None)
+    return {
+        "degree": dxf.degree,
+        "flag": dxf.flags,
+        "control_points": [round_coordinates(point) for point in getattr(entity, 'control_points', ())],
+        "fit_points": [round_coordinates(point) for point in getattr(entity, 'fit_points', ())],
+        "knots": round_coordinates(knots) if knots is not None else [],
+        "weights": round_coordinates(weights) if weights is not None else [],
+        "start_tangent": round_coordinates(getattr(dxf, 'start_tangent', None)),
+        "end_tangent": round_coordinates(getattr(dxf, 'end_tangent', None)),
+    }
+
+def _helix_data(entity, dxf):
+    return {
+        "axis_base_point": round_coordinates(dxf.axis_base_point),
+        "start_point": round_coordinates(dxf.start_point),
+        "axis_vector": round_coordinates(dxf.axis_vector),
+        "radius": round_coordinates(dxf.radius),
+        "turn_height": dxf.turn_height,
+        "turns": dxf.turns,
+        "handedness": "counter clockwise" if dxf.handedness == 1 else "clockwise",
+        "control_points": [round_coordinates(point) for point in getattr(entity, 'control_points', ())],
+    }
+
+def _circle_data(entity, dxf):
+    return {
+        "center": round_coordinates(dxf.center),
+        "radius": dxf.radius,
+        "extrusion": round_coordinates(dxf.extrusion), 
+    }
+
+def _ellipse_data(entity, dxf):
+    return {
+        "center": round_coordinates(dxf.center),
+        "major_axis": round_coordinates(dxf.major_axis),
+        "minor_axis": round_coordinates(getattr(entity, 'minor_axis', None)),
+        "ratio": dxf.ratio,  # Relación eje menor/mayor
+        "start_point": round_coordinates(entity.start_point),
+        "end_point": round_coordinates(entity.end_point),
+        "extrusion": round_coordinates(dxf.extrusion),  
+    }
+
+def _polyline_data(entity, dxf):
+    return {
+        "points": [round_coordinates(vertex.dxf.location) for vertex in getattr(entity, 'vertices', ())],
+        "is_closed": entity.is_closed,
+    }
+
+def _lwpolyline_data(entity, dxf):
+    return {
+        "points": [round_coordinates(vertex) for vertex in entity],
+        "is_closed": entity.is_closed,
+    }
+
+# Tipo DXF ---> manejador (los tipos no listados solo guardan los datos base)
+ENTITY_HANDLERS = {
+    "LINE": _line_data,             # LÍNEA
+    "ARC": _arc_data,               # ARCO
+    "SPLINE": _spline_data,         # SPLINE
+    "HELIX": _helix_data,           # HÉLICE
+    "CIRCLE": _circle_data,         # CÍRCULO
+    "ELLIPSE": _ellipse_data,       # ELIPSE
+    "POLYLINE": _polyline_data,     # POLILÍNEA
+    "LWPOLYLINE": _lwpolyline_data, # POLILÍNEA LIGERA
+}
+
 def extract_geometry_from_dxf(file_path, output_file):
     doc = ezdxf.readfile(file_path)
     modelspace = doc.modelspace()
@@ -17,106 +113,21 @@ def extract_geometry_from_dxf(file_path, output_file):
         "planos": []
     }
 
-    def round_coordinates(coords):
-        if isinstance(coords, (float, int)):
-            return round(coords, 8)
-        if coords is None:
-            return None
-        return tuple(round(coord, 8) for coord in coords)
-
     for entity in modelspace:
-        entity_data = str(entity)
-        weight = entity.dxf.lineweight if entity.dxf.hasattr("lineweight") else -1
+        dxf = entity.dxf
+        etype = entity.dxftype()
+        weight = dxf.get("lineweight", -1)
 
         base_data = {
-            "type": entity.dxftype(),
+            "type": etype,
             "weight": weight,
-            "color": entity.dxf.color,
-            "entity": entity_data
+            "color": dxf.color,
+            "entity": str(entity)
         }
 
-        # --- LÍNEA ---
-        if entity.dxftype() == "LINE":
-            base_data.update({
-                "start_point": round_coordinates(entity.dxf.start),
-                "end_point": round_coordinates(entity.dxf.end),
-            })
-
-        # --- ARCO ---
-        elif entity.dxftype() == "ARC":
-            base_data.update({
-                "center": round_coordinates(entity.dxf.center),
-                "radius": round_coordinates(entity.dxf.radius),
-                "start_point": round_coordinates(entity.start_point),
-                "end_point": round_coordinates(entity.end_point),
-                "start_angle": round_coordinates(entity.dxf.start_angle),
-                "end_angle": round_coordinates(entity.dxf.end_angle),
-                "extrusion": round_coordinates(entity.dxf.extrusion), 
-            })
-
-        # --- SPLINE ---
-        elif entity.dxftype() == "SPLINE":
-            control_points = entity.control_points if hasattr(entity, 'control_points') else []
-            fit_points = entity.fit_points if hasattr(entity, 'fit_points') else []
-            
-            base_data.update({
-                "degree": entity.dxf.degree,
-                "flag": entity.dxf.flags,
-                "control_points": [round_coordinates(point) for point in control_points],
-                "fit_points": [round_coordinates(point) for point in fit_points],
-                "knots": round_coordinates(entity.knots)if hasattr(entity, 'knots') else [],
-                "weights": round_coordinates(entity.weights)if hasattr(entity, 'weights')else [],
-                "start_tangent": round_coordinates(entity.dxf.start_tangent) if hasattr(entity.dxf, 'start_tangent') else None,
-                "end_tangent": round_coordinates(entity.dxf.end_tangent) if hasattr(entity.dxf, 'end_tangent') else None,
-            })
-
-        # --- HÉLICE ---
-        elif entity.dxftype() == "HELIX":
-            base_data.update({
-                "axis_base_point": round_coordinates(entity.dxf.axis_base_point),
-                "start_point": round_coordinates(entity.dxf.start_point),
-                "axis_vector": round_coordinates(entity.dxf.axis_vector),
-                "radius": round_coordinates(entity.dxf.radius),
-                "turn_height": entity.dxf.turn_height,
-                "turns": entity.dxf.turns,
-                "handedness": "counter clockwise" if entity.dxf.handedness == 1 else "clockwise",
-                "control_points": [round_coordinates(point) for point in entity.control_points] if hasattr(entity, 'control_points') else [],
-            })
-
-        # --- CÍRCULO ---
-        elif entity.dxftype() == "CIRCLE":
-            base_data.update({
-                "center": round_coordinates(entity.dxf.center),
-                "radius": entity.dxf.radius,
-                "extrusion": round_coordinates(entity.dxf.extrusion), 
-            })
-
-        # --- ELIPSE ---
-        elif entity.dxftype() == "ELLIPSE":
-            base_data.update({
-                "center": round_coordinates(entity.dxf.center),
-                "major_axis": round_coordinates(entity.dxf.major_axis),
-                "minor_axis": round_coordinates(entity.minor_axis) if hasattr(entity, 'minor_axis') else None,
-                "ratio": entity.dxf.ratio,  # Relación eje menor/mayor
-                "start_point": round_coordinates(entity.start_point),
-                "end_point": round_coordinates(entity.end_point),
-                "extrusion": round_coordinates(entity.dxf.extrusion),  
-            })
-
-        # --- POLILÍNEA ---
-        elif entity.dxftype() == "POLYLINE":
-            points = [round_coordinates(vertex.dxf.location) for vertex in entity.vertices] if hasattr(entity, 'vertices') else []
-            base_data.update({
-                "points": points,
-                "is_closed": entity.is_closed,
-            })
-
-        # --- POLILÍNEA LIGERA ---
-        elif entity.dxftype() == "LWPOLYLINE":
-            base_data.update({
-                "points": [round_coordinates(vertex) for vertex in entity],
-                "is_closed": entity.is_closed,
-            })
+        handler = ENTITY_HANDLERS.get(etype)
+        if handler:
+            base_data.update(handler(entity, dxf))
 
         # Clasificación por peso de línea
         if weight < 0:
@@ -139,4 +150,4 @@ os.chdir(directory)
 dxf_file_name = 'RegHelix.dxf'
 output_file_name = "RegHelix_Raw_2.txt"
 
-extract_geometry_from_dxf(dxf_file_name, output_file_name)
\ No newline at end of file
+extract_geometry_from_dxf(dxf_file_name, output_file_name)
\ No newline at end of file
@@ -3,65 +3,144 @@
 # Estima el tiempo de trayectoria de un script AEROTECH A3200
 
 import re
-import math
 import sys
 import os
+import numpy as np
+
+# Expresiones regulares. F es modal: un LINEAR sin F mantiene el último F
+# indicado, que puede ser "F $SPEED" o un valor explícito
+re_speed  = re.compile(r'^\s*\$SPEED\s*=\s*([\d\.]+)')
+re_linear = re.compile(
+    r'^\s*LINEAR\s+X([-\d\.]+)\s+Y([-\d\.]+)\s+Z([-\d\.]+)(?:\s+F\s*(\$SPEED|[\d\.]+))?'
+)
+re_dwell  = re.compile(r'^\s*dwell\s+([\d\.]+)', re.IGNORECASE)
+re_helix  = re.compile(r"^\s*'\s*HELIX_META\s+puntos=(\d+)\s+longitud=([\d\.]+)")
 
 def estimate_time(file_path):
-    coords = []         # lista de tuplas (x, y, z, speed)
+    xyz = []            # coordenadas como texto, planas: x0, y0, z0, x1, ...
+    speeds = []         # velocidad (F vigente) al llegar a cada punto
     dwell_times = []    # lista de tiempos de dwell (s)
     current_speed = None
+    current_feed = None # último F, que se mantiene en los LINEAR sin F
+
+    # Hélices con metadatos (HELIX_META): su recorrido se sustituye por la
+    # longitud de arco analítica en lugar de sumar sus N tramos. Los metadatos
+    # son solo un comentario: si el bloque no cuadra (otro número de puntos,
+    # cambio de $SPEED, sin ShutterClose) sus puntos se suman como siempre
+    helix = None        # (puntos, longitud) de la hélice anunciada
+    in_helix = False    # dentro de los tramos de la hélice, hasta ShutterClose
+    helix_lines = []    # líneas LINEAR de la hélice tras el primer punto (sin parsear)
+    helix_segments = [] # tramo que sustituye a cada hélice
+    helix_time = 0.0
+    extra_segments = 0
 
-    # Expresiones regulares
-    re_speed  = re.compile(r'^\s*\$SPEED\s*=\s*([\d\.]+)')
-    re_linear = re.compile(
-        r'^\s*LINEAR\s+X([-\d\.]+)\s+Y([-\d\.]+)\s+Z([-\d\.]+)\s+F\s+\$SPEED'
-    )
-    re_dwell  = re.compile(r'^\s*dwell\s+([\d\.]+)', re.IGNORECASE)
+    def feed_of(m_lin):
+        nonlocal current_feed
+        feed = m_lin.group(4)
+        if feed == '$SPEED':
+            if current_speed is None:
+                raise RuntimeError("Se usa F $SPEED antes de definir $SPEED")
+            current_feed = current_speed
+        elif feed:
+            current_feed = float(feed)
+        elif current_feed is None:
+            raise RuntimeError("LINEAR sin F antes de indicar ninguna velocidad")
+        return current_feed
 
-# … (imports y expresiones regulares iguales)
+    def end_helix(closed):
+        nonlocal helix, in_helix, helix_time, extra_segments
+        m_last = re_linear.match(helix_lines[-1]) if helix_lines else None
+        if (closed and m_last and len(helix_lines) == helix[0] - 1
+                and all(' F $SPEED' in text for text in helix_lines)):
+            # tramo primer punto -> último punto, con tiempo analítico
+            helix_segments.append(len(speeds) - 1)
+            helix_time += helix[1] / speeds[-1]
+            extra_segments += helix[0] - 2
+            xyz.extend(m_last.group(1, 2, 3))
+            speeds.append(feed_of(m_last))
+        else:
+            for text in helix_lines:
+                m_lin = re_linear.match(text)
+                if m_lin:
+                    xyz.extend(m_lin.group(1, 2, 3))
+                    speeds.append(feed_of(m_lin))
+        helix = None
+        in_helix = False
+        helix_lines.clear()
 
     with open(file_path, 'r') as f:
         for line in f:
+            stripped = line.lstrip()
+
+            # 0) Tramos de una hélice con longitud conocida: las líneas LINEAR
+            # se guardan sin parsear hasta cerrar el shutter
+            if in_helix:
+                if stripped.startswith('LINEAR'):
+                    helix_lines.append(stripped)
+                    continue
+                if stripped.rstrip() == 'ShutterClose':
+                    end_helix(closed=True)
+                    continue
+                # Un cambio de velocidad o una nueva hélice invalidan el bloque
+                if stripped.startswith('$') or re_helix.match(stripped):
+                    end_helix(closed=False)
+
+            # Solo se evalúa la expresión que corresponde al primer carácter;
+            # el resto de líneas (comentarios, macros, vacías) se descartan
+            ch = stripped[:1]
+            if ch == "'":
+                m_helix = re_helix.match(stripped)
+                if m_helix:
+                    helix = (int(m_helix.group(1)), float(m_helix.group(2)))
+                continue
+
             # 1) Detecto un cambio de velocidad
-            m_speed = re_speed.match(line)
-            if m_speed:
-                current_speed = float(m_speed.group(1))
-                # sigo al siguiente
+            if ch == '$':
+                m_speed = re_speed.match(stripped)
+                if m_speed:
+                    current_speed = float(m_speed.group(1))
                 continue
 
             # 2) Detecto un tramo LINEAR
-            m_lin = re_linear.match(line)
-            if m_lin:
-                if current_speed is None:
-                    raise RuntimeError("Se usa F $SPEED antes de definir $SPEED")
-                x, y, z = map(float, m_lin.groups())
-                # añado el tramo con la velocidad actual
-                coords.append((x, y, z, current_speed))
+            if ch == 'L':
+                m_lin = re_linear.match(stripped)
+                if not m_lin:
+                    continue
+                # añado el punto con el F vigente; la conversión a float se
+                # hace de una vez con NumPy al final
+                xyz.extend(m_lin.group(1, 2, 3))
+                speeds.append(feed_of(m_lin))
+                # el primer punto de una hélice anunciada inicia sus tramos
+                if helix is not None:
+                    in_helix = True
                 continue
 
             # 3) Detecto dwell (pausa)
-            m_dwell = re_dwell.match(line)
-            if m_dwell:
-                dwell_times.append(float(m_dwell.group(1)))
+            if ch == 'd' or ch == 'D':
+                m_dwell = re_dwell.match(stripped)
+                if m_dwell:
+                    dwell_times.append(float(m_dwell.group(1)))
 
+    # Hélice sin ShutterClose al final del fichero
+    if in_helix:
+        end_helix(closed=False)
 
+    coords = np.array(xyz, dtype=float).reshape(-1, 3)
     if len(coords) < 2:
         print("No se encontraron suficientes puntos LINEAR para calcular recorrido.")
         return
 
-    # Calcular tiempo total
-    total_time = 0            # tiempo de arranque (10s por defecto)
-    for (x0, y0, z0, s0), (x1, y1, z1, s1) in zip(coords, coords[1:]):
-        dist = math.sqrt((x1-x0)**2 + (y1-y0)**2 + (z1-z0)**2)
-        total_time += dist / s0
+    # Calcular tiempo total: cada tramo se recorre a la velocidad de su inicio
+    dists = np.linalg.norm(np.diff(coords, axis=0), axis=1)
+    dists[helix_segments] = 0.0
+    total_time = float((dists / np.array(speeds[:-1])).sum()) + helix_time
 
     # Añadir pausas dwell
     total_time += sum(dwell_times)
 
     # Mostrar resultado
     mins, secs = divmod(total_time, 60)
-    print(f"Distancia total de {len(coords)-1} tramos.")
+    print(f"Distancia total de {len(coords)-1+extra_segments} tramos.")
     print(f"Tiempo total estimado: {total_time:.2f} s  ({int(mins)} min {secs:.2f} s)")
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Round-trip de process_planes.parse_entity sobre líneas con el formato que
+escribe dxftotxt (str de un dict por entidad).
+
+Ejecutar con: python -m unittest discover -s tests
+"""
+
+import ast
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Project', 'GetPlanes'))
+
+from process_planes import parse_entity, _as_lists
+
+# Entidades como las genera dxftotxt.extract_geometry_from_dxf
+ENTITIES = {
+    'LINE': {'type': 'LINE', 'weight': 25, 'color': 6, 'entity': 'LINE(#1)',
+             'start_point': (0.0, -12.5, 3.25), 'end_point': (100, 0, 0)},
+    'ARC': {'type': 'ARC', 'weight': 25, 'color': 5, 'entity': 'ARC(#2)',
+            'center': (60.0, 40.0, 0.0), 'radius': 10.0,
+            'start_point': (60.0, 30.0, 0.0), 'end_point': (60.0, 50.0, 0.0),
+            'start_angle': 270.0, 'end_angle': 90.0, 'extrusion': (0.0, 0.0, 1.0)},
+    'LWPOLYLINE': {'type': 'LWPOLYLINE', 'weight': 30, 'color': 256, 'entity': 'LWPOLYLINE(#3)',
+                   'points': [(0.0, 0.0, 0.0, 0.0, 0.0), (1.0, 1.11111111, 0.0, 0.0, 0.0),
+                              (2.0, 0.0, 0.0, 0.0, 0.0)],
+                   'is_closed': True},
+    'POLYLINE': {'type': 'POLYLINE', 'weight': -1, 'color': 256, 'entity': 'POLYLINE(#4)',
+                 'points': [(0.0, 0.0, 0.0), (1.0, 1.0, 1.0)], 'is_closed': False},
+    'CIRCLE': {'type': 'CIRCLE', 'weight': 25, 'color': 1, 'entity': 'CIRCLE(#5)',
+               'center': (-365.635756, 347.433737, 263.774619), 'radius': 3.5,
+               'extrusion': (0.0, -0.6, -0.8)},
+    'ELLIPSE': {'type': 'ELLIPSE', 'weight': 25, 'color': 256, 'entity': 'ELLIPSE(#6)',
+                'center': (0.0, 1.0, 0.0), 'major_axis': (3.0, 0.0, 0.0), 'minor_axis': None,
+                'ratio': 0.5, 'start_point': (3.0, 1.0, 0.0), 'end_point': (-2.97, 1.21, 0.0),
+                'extrusion': (0.0, 0.0, 1.0)},
+    'SPLINE': {'type': 'SPLINE', 'weight': -1, 'color': 256, 'entity': 'SPLINE(#7)',
+               'degree': 3, 'flag': 0, 'control_points': [], 'fit_points': [(0.0, 0.0, 0.0), (1.0, 2.0, 0.0)],
+               'knots': [], 'weights': [], 'start_tangent': None, 'end_tangent': None},
+    'HELIX': {'type': 'HELIX', 'weight': -1, 'color': 5, 'entity': 'HELIX(#9)',
+              'axis_base_point': (0.0, 0.0, 0.0), 'start_point': (10.0, 0.0, 0.0),
+              'axis_vector': (0.0, 0.0, 1.0), 'radius': 10.0, 'turn_height': 5.0, 'turns': 3.0,
+              'handedness': 'counter clockwise', 'control_points': []},
+}
+
+class ParseEntityRoundTrip(unittest.TestCase):
+
+    def assertRoundTrip(self, entity):
+        line = str(entity)
+        parsed = parse_entity(line)
+        self.assertEqual(parsed, _as_lists(entity))
+        # Mismos tipos que literal_eval (int/float/bool/None), no solo iguales
+        self.assertEqual(repr(parsed), repr(_as_lists(ast.literal_eval(line))))
+
+    def test_every_entity_type(self):
+        for entity_type, entity in ENTITIES.items():
+            with self.subTest(entity_type=entity_type):
+                self.assertRoundTrip(entity)
+
+    def test_constants(self):
+        self.assertRoundTrip({'a': None, 'b': True, 'c': False, 'd': 'None', 'e': 'True'})
+
+    def test_nested_tuples(self):
+        self.assertRoundTrip({'points': [((1, 2.5), (3, -1e-05)), ()], 'p': ((0.0,), (1.0, 2.0))})
+
+    def test_strings_with_quotes_and_parens(self):
+        self.assertRoundTrip({'entity': 'LINE(#8) (copia)', 'layer': "it's"})
+        self.assertRoundTrip({'layer': 'a\'b"c', 'path': 'C:\\Users\\x'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Planes2AB_Raster.generate_raster_lines.
+
+Ejecutar con: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from shapely import affinity
+from shapely.geometry import Polygon, Point, LineString, MultiLineString, GeometryCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Project', 'GetPlanes'))
+
+from Planes2AB_Raster import generate_raster_lines
+
+def geos_raster_lines(polygon, spacing):
+    """Versión original con polygon.intersection por fila (referencia). Los
+    tramos que GEOS devuelve con longitud de redondeo en un vértice se
+    descartan, igual que en generate_raster_lines"""
+    minx, miny, maxx, maxy = polygon.bounds
+    y = miny
+    coords2d = []
+    forward = True
+    while y <= maxy:
+        inter = polygon.intersection(LineString([(minx - spacing, y), (maxx + spacing, y)]))
+        if isinstance(inter, LineString):
+            segs = [inter]
+        elif isinstance(inter, (MultiLineString, GeometryCollection)):
+            segs = [g for g in inter.geoms if isinstance(g, LineString)]
+        else:
+            segs = []
+        for seg in segs:
+            if seg.length <= 1e-9 * spacing:
+                continue
+            c = list(seg.coords)
+            if not forward:
+                c.reverse()
+            coords2d.extend(c)
+            forward = not forward
+        y += spacing
+    return np.array(coords2d, float).reshape(-1, 2)
+
+def random_polygons(n, seed=0):
+    # Polígonos estrellados: vértices aleatorios ordenados por ángulo
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        pts = rng.uniform(-3, 3, (rng.integers(3, 12), 2))
+        c = pts.mean(axis=0)
+        polygon = Polygon(pts[np.argsort(np.arctan2(pts[:, 1] - c[1], pts[:, 0] - c[0]))])
+        if polygon.is_valid and polygon.area > 1e-3:
+            yield polygon
+
+class RasterLines(unittest.TestCase):
+
+    def assertSameRaster(self, polygon, spacing):
+        expected = geos_raster_lines(polygon, spacing)
+        coords = generate_raster_lines(polygon, spacing)
+        self.assertEqual(coords.shape, expected.shape)
+        np.testing.assert_allclose(coords, expected, rtol=0, atol=1e-9)
+
+    def test_matches_geos_on_random_polygons(self):
+        for i, polygon in enumerate(random_polygons(400)):
+            with self.subTest(polygon=i):
+                self.assertSameRaster(polygon, 0.1)
+
+    def test_matches_geos_on_concave_and_holed_polygons(self):
+        u = Polygon([(0, 0), (9, 0), (9, 6), (6, 6), (6, 2), (3, 2), (3, 6), (0, 6)])
+        holed = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)], [[(3, 3), (7, 3), (7, 7), (3, 7)]])
+        polygons = {'U': u, 'holed': holed, 'circle': Point(0, 0).buffer(5.3, 32),
+                    'U rotated': affinity.rotate(u, 17), 'holed rotated': affinity.rotate(holed, 23)}
+        for name, polygon in polygons.items():
+            for spacing in (0.1, 0.37):
+                with self.subTest(polygon=name, spacing=spacing):
+                    self.assertSameRaster(polygon, spacing)
+
+    def test_single_vertex_bottom_row(self):
+        # La primera fila (y == miny) solo toca el vértice inferior: sus dos
+        # aristas dan la misma x salvo un ulp y no debe salir un tramo nulo
+        polygon = Polygon([(0.3, -1.7), (2.1, 0.4), (-0.9, 1.3)])
+        coords = generate_raster_lines(polygon, 0.1)
+        self.assertGreater(coords[0, 1], -1.7)
+        segments = coords.reshape(-1, 2, 2)
+        self.assertTrue((np.abs(segments[:, 1, 0] - segments[:, 0, 0]) > 0).all())
+        # La fila siguiente empieza de izquierda a derecha
+        self.assertLess(segments[0, 0, 0], segments[0, 1, 0])
+
+if __name__ == '__main__':
+    unittest.main()